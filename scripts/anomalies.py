@@ -0,0 +1,179 @@
+"""Streaming sanity checks for extracted records.
+
+A wrong-but-present value (a meter read picked up as usage, a total picked up
+as a charge) passes the pipeline's "no ... found" warnings and goes straight
+to the dashboard. The Validator looks at each record once, in date order,
+and flags it when:
+
+- its period is backwards, implausibly short or long, or ends after the
+  statement date (reported once per distinct period, so the same wrong
+  period copied onto several bills is one flag);
+- its period starts more than MAX_GAP days after the previous record's
+  period ended or overlaps it by more than MAX_OVERLAP days (reported on the
+  later record only, and only when the previous period looked right);
+- a per-unit rate is more than RATE_FACTOR times off the median of the
+  last WINDOW rates;
+- usage has a z-score above Z_LIMIT against the same calendar month in
+  earlier years (once MIN_YEARS of them are known). Rates are only compared
+  with recent bills, since prices drift too much for a seasonal baseline.
+
+Its state is a few numbers per month plus the rate windows, kept in
+.cache/anomalies/<provider>.json, so an extraction run only feeds the new
+records. The state is rebuilt from the whole record file when it is missing,
+out of step with it, or a new record predates the last one seen.
+"""
+
+import json
+import math
+import os
+import statistics
+from collections import deque
+from datetime import date
+
+from record_store import atomic_write_json
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "anomalies")
+STATE_VERSION = 2
+
+WINDOW = 6
+RATE_FACTOR = 3.0
+Z_LIMIT = 3.5
+MIN_YEARS = 3
+MIN_DAYS = 10
+MAX_DAYS = 70
+MAX_GAP = 45
+MAX_OVERLAP = 7
+
+
+def record_date(record):
+    return record.get("period_end") or record.get("statement_date") or ""
+
+
+class Validator:
+    """Checks one provider's records as they stream past, oldest first."""
+
+    def __init__(self, usage, costs, state=None):
+        self.usage = usage
+        self.costs = costs
+        state = state or {}
+        self.count = state.get("count", 0)
+        self.last_date = state.get("last_date")
+        # Wrong periods already reported ("start/end"), and the end of the previous
+        # record's period if it looked right
+        self.bad_periods = set(state.get("bad_periods", ()))
+        self.last_good_end = state.get("last_good_end")
+        # month ("01".."12") -> usage [n, mean, M2] (Welford)
+        self.months = state.get("months", {})
+        self.windows = {cost: deque(state.get("windows", {}).get(cost, ()), maxlen=WINDOW) for cost in costs}
+
+    def state(self):
+        return {"version": STATE_VERSION, "count": self.count, "last_date": self.last_date,
+                "bad_periods": sorted(self.bad_periods), "last_good_end": self.last_good_end,
+                "months": self.months, "windows": {cost: list(w) for cost, w in self.windows.items()}}
+
+    def check(self, record):
+        """Return a list of problems with `record`, then fold it into the running state."""
+        problems = self._check_period(record)
+        usage = record.get(self.usage)
+        rates = {}
+        for cost in self.costs:
+            charge = record.get(cost)
+            rates[cost] = charge / usage if charge is not None and usage else None
+
+        for cost, rate in rates.items():
+            if rate is None or len(self.windows[cost]) < WINDOW:
+                continue
+            median = statistics.median(self.windows[cost])
+            if median > 0 and not median / RATE_FACTOR <= rate <= median * RATE_FACTOR:
+                problems.append(f"{cost} rate {rate:.4f}/{self.usage} vs recent median {median:.4f}")
+
+        if usage is not None:
+            month = record_date(record)[5:7]
+            n, mean, m2 = self.months.get(month, (0, 0.0, 0.0))
+            if n >= MIN_YEARS and m2 > 0:
+                z = (usage - mean) / math.sqrt(m2 / (n - 1))
+                if abs(z) > Z_LIMIT:
+                    problems.append(f"{self.usage} {usage:g} is {z:+.1f} sd from this month's mean {mean:.0f}")
+            n += 1
+            delta = usage - mean
+            mean += delta / n
+            self.months[month] = [n, mean, m2 + delta * (usage - mean)]
+
+        for cost, rate in rates.items():
+            if rate is not None:
+                self.windows[cost].append(rate)
+        self.count += 1
+        self.last_date = max(self.last_date or "", record_date(record))
+        return problems
+
+    def _check_period(self, record):
+        """Return at most one problem with the record's period, checked on its own and against the last one."""
+        start, end = record.get("period_start"), record.get("period_end")
+        last_end, self.last_good_end = self.last_good_end, None
+        if not start or not end:
+            return []
+        days = (date.fromisoformat(end) - date.fromisoformat(start)).days
+        statement_date = record.get("statement_date")
+        wrong = []
+        if days <= 0:
+            wrong.append("runs backwards")
+        elif not MIN_DAYS <= days <= MAX_DAYS:
+            wrong.append(f"is {days} days")
+        if statement_date and end > statement_date:
+            wrong.append(f"ends after the statement date {statement_date}")
+        if wrong:
+            if f"{start}/{end}" in self.bad_periods:
+                return []
+            self.bad_periods.add(f"{start}/{end}")
+            return [f"period {start} to {end} {' and '.join(wrong)}"]
+
+        self.last_good_end = end
+        if last_end is None:
+            return []
+        gap = (date.fromisoformat(start) - date.fromisoformat(last_end)).days
+        if gap > MAX_GAP:
+            return [f"period starts {start}, {gap} days after the last one ended"]
+        if -gap > MAX_OVERLAP:
+            return [f"period starts {start}, {-gap} days before the last one ended"]
+        return []
+
+
+def scan(provider, records):
+    """Check every record from scratch; return (validator, [(filename, problem), ...])."""
+    validator = Validator(provider.summary.usage, provider.summary.costs)
+    flags = []
+    for record in sorted(records, key=record_date):
+        flags.extend((record["filename"], p) for p in validator.check(record))
+    return validator, flags
+
+
+def check_new(provider, new_records, records, state_dir=STATE_DIR):
+    """Flag problems in `new_records`, resuming from the saved state when it is still valid.
+
+    `records` is the provider's full record list (or its RecordStore) after
+    the new ones were added; only its length is used unless the state has to
+    be rebuilt.
+    """
+    if provider.summary is None or not new_records:
+        return []
+    path = os.path.join(state_dir, provider.name + ".json")
+    try:
+        with open(path) as fp:
+            state = json.load(fp)
+    except (FileNotFoundError, ValueError):
+        state = None
+
+    new_records = sorted(new_records, key=record_date)
+    if (state is None or state.get("version") != STATE_VERSION
+            or state["count"] + len(new_records) != len(records)
+            or record_date(new_records[0]) < (state["last_date"] or "")):
+        new = {r["filename"] for r in new_records}
+        validator, flags = scan(provider, records)
+        flags = [(f, p) for f, p in flags if f in new]
+    else:
+        validator = Validator(provider.summary.usage, provider.summary.costs, state)
+        flags = [(r["filename"], p) for r in new_records for p in validator.check(r)]
+
+    os.makedirs(state_dir, exist_ok=True)
+    atomic_write_json(path, validator.state(), indent=None)
+    return flags
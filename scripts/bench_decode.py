@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Micro-benchmark the +29 decoder against the original per-character rawdict loop.
+
+Runs over the garbled 2009-2015 Eversource statements for 110 Tudor St by
+default, checks that both decoders produce identical text, and prints timings.
+"""
+
+import argparse
+import os
+import time
+
+import pymupdf
+
+from extract_electric_110tudor import PROVIDER, is_garbled
+from statements import decode_page
+
+
+def decode_page_chars(page):
+    """Reference decoder: the original per-character rawdict loop."""
+    blocks = page.get_text("rawdict")["blocks"]
+    full_text = []
+    for block in blocks:
+        if "lines" in block:
+            for line in block["lines"]:
+                line_chars = []
+                for span in line["spans"]:
+                    for c in span.get("chars", []):
+                        code = ord(c["c"])
+                        new_code = code + 29
+                        if new_code > 126:
+                            new_code = new_code - 95
+                        line_chars.append(chr(new_code))
+                full_text.append("".join(line_chars))
+    return "\n".join(full_text)
+
+
+def time_decoder(decoder, docs, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = ["\n".join(decoder(page) for page in doc) for doc in docs]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", nargs="?", default=PROVIDER.base())
+    parser.add_argument("--years", default="2009-2015", help="statement years to include, e.g. 2009-2015")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    first_year, last_year = (int(y) for y in args.years.split("-"))
+    docs = []
+    for f in sorted(os.listdir(args.directory)):
+        if not ("Statement" in f and f.endswith(".pdf") and f[:4].isdigit()):
+            continue
+        if not first_year <= int(f[:4]) <= last_year:
+            continue
+        doc = pymupdf.open(os.path.join(args.directory, f))
+        if len(doc) and is_garbled(doc[0].get_text(sort=True)):
+            docs.append(doc)
+        else:
+            doc.close()
+    if not docs:
+        print("No garbled statements found.")
+        return
+
+    pages = sum(len(doc) for doc in docs)
+    old_time, old_texts = time_decoder(decode_page_chars, docs, args.repeat)
+    new_time, new_texts = time_decoder(decode_page, docs, args.repeat)
+    mismatches = sum(1 for a, b in zip(old_texts, new_texts) if a != b)
+
+    print(f"Garbled statements: {len(docs)} ({pages} pages)")
+    print(f"Per-char rawdict:   {old_time * 1000:8.1f} ms")
+    print(f"translate + dict:   {new_time * 1000:8.1f} ms  ({old_time / new_time:.1f}x)")
+    print(f"Text mismatches:    {mismatches}")
+    for doc in docs:
+        doc.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Regression benchmark for the statement parsers over a synthetic corpus.
+
+Generates statements for every historical layout (see synthetic_statements),
+runs the full extract + parse path on each, and checks every record against
+the values the statement was generated from, and the same for synthetic
+vehicle invoices through extract_vehicles. Prints files/sec, parse-only
+throughput per provider and per-field latency, and compares them with a saved
+baseline so a slower rule table or extraction path shows up as a regression.
+
+    python scripts/bench_parsers.py --save-baseline   # on a known-good tree
+    python scripts/bench_parsers.py                   # exits 1 on mismatch or regression
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import profiling
+import extract_vehicles
+import synthetic_statements
+from pipeline import process_statement
+from providers import load_providers
+from statements import extract_text
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+
+def check(statements, providers, directory, lazy=False, words=False):
+    """Extract and parse every statement once; return (mismatches, seconds, texts)."""
+    mismatches = []
+    texts = {}
+    start = time.perf_counter()
+    for s in statements:
+        provider = providers[s.provider]
+        record, warnings = process_statement(provider, os.path.join(directory, s.provider, s.filename), s.filename,
+                                             lazy=lazy, words=words)
+        if record is not None:
+            record.pop("rules", None)
+            record.pop("layout", None)
+        if record != s.expected:
+            mismatches.append((s, record, warnings))
+    elapsed = time.perf_counter() - start
+
+    # Text for the parse-only timings, extracted outside the timed loop
+    for s in statements:
+        provider = providers[s.provider]
+        path = os.path.join(directory, s.provider, s.filename)
+        texts[s.filename] = (s, extract_text(path, provider.is_garbled, provider.passwords))
+    return mismatches, elapsed, texts
+
+
+def check_invoices(invoices, directory):
+    """Read every synthetic vehicle file as extract_vehicles does; return mismatches as check() does.
+
+    A file expected to give no event must be passed over, either by name or after parsing.
+    """
+    vehicles = {v.name: v for v in extract_vehicles.VEHICLES}
+    mismatches = []
+    for s in invoices:
+        vehicle = vehicles[s.provider]
+        if not extract_vehicles.is_invoice(s.filename):
+            event, warnings = None, [f"  {s.filename}: not taken for an invoice"]
+        else:
+            with open(os.path.join(directory, s.provider, s.filename), "rb") as fp:
+                event, warnings, _ = extract_vehicles._parse_one((vehicle, s.provider, s.filename, None), fp.read())
+        if event != s.expected:
+            mismatches.append((s, event, warnings))
+    return mismatches
+
+
+def time_parsers(texts, providers, repeat):
+    """Parse each text `repeat` times; return per-provider files/sec and per-field mean seconds."""
+    parse_time = {}
+    parsed = {}
+    fields = {}
+    for s, text in texts.values():
+        if text is None:
+            continue
+        parse = providers[s.provider].parse_statement
+        best = None
+        for _ in range(repeat):
+            profiling.start()
+            t = time.perf_counter()
+            parse(text, s.filename)
+            elapsed = time.perf_counter() - t
+            timings = profiling.stop()
+            if best is None or elapsed < best[0]:
+                best = (elapsed, timings)
+        elapsed, timings = best
+        parse_time[s.provider] = parse_time.get(s.provider, 0.0) + elapsed
+        parsed[s.provider] = parsed.get(s.provider, 0) + 1
+        for name, (calls, total, _) in timings["stages"].items():
+            if name.startswith("field:"):
+                key = f"{s.provider}.{name[len('field:'):]}"
+                n, t = fields.get(key, (0, 0.0))
+                fields[key] = (n + 1, t + total)
+    rates = {name: parsed[name] / parse_time[name] for name in parsed}
+    return rates, {key: t / n for key, (n, t) in fields.items()}
+
+
+def compare(current, baseline, tolerance):
+    """Return a list of (metric, baseline, current) that got worse by more than `tolerance`."""
+    regressions = []
+    for name, value in current["throughput"].items():
+        old = baseline.get("throughput", {}).get(name)
+        if old and value < old * (1 - tolerance):
+            regressions.append((name, old, value))
+    for name, value in current["field_latency"].items():
+        old = baseline.get("field_latency", {}).get(name)
+        if old and value > old * (1 + tolerance):
+            regressions.append((name, old, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-layout", type=int, default=25, help="statements generated per layout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="parse-only repetitions per statement (best is kept)")
+    parser.add_argument("--corpus", metavar="DIR", help="write the corpus here and keep it (default: a temp dir)")
+    parser.add_argument("--lazy", action="store_true", help="extract pages lazily, as extract.py --lazy does")
+    parser.add_argument("--words", action="store_true", help="read fields from word boxes, as extract.py --words does")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline timings JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's timings as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="fraction slower than baseline that counts as a regression (default 0.3)")
+    args = parser.parse_args()
+
+    providers = {p.name: p for p in load_providers()}
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.corpus or tmp
+        statements = synthetic_statements.generate(directory, args.per_layout, args.seed)
+        mismatches, elapsed, texts = check(statements, providers, directory, args.lazy, args.words)
+        invoices = synthetic_statements.generate(directory, args.per_layout, args.seed,
+                                                 synthetic_statements.INVOICE_LAYOUTS)
+        mismatches += check_invoices(invoices, directory)
+    rates, field_latency = time_parsers(texts, providers, args.repeat)
+
+    layouts = sorted({s.layout for s in statements})
+    print(f"Synthetic statements: {len(statements)} ({len(layouts)} layouts)")
+    print(f"Synthetic invoices:   {len(invoices)} ({len(synthetic_statements.INVOICE_LAYOUTS)} layouts)")
+    print(f"Extract + parse:      {len(statements) / elapsed:8.1f} files/sec")
+    print("\nParse only (files/sec)")
+    for name in sorted(rates):
+        print(f"  {name:<26}{rates[name]:>10.0f}")
+    print("\nPer-field latency (mean us)")
+    for key in sorted(field_latency):
+        print(f"  {key:<26}{field_latency[key] * 1e6:>10.1f}")
+
+    if mismatches:
+        print(f"\nMISMATCHES: {len(mismatches)}")
+        for s, record, warnings in mismatches:
+            print(f"  [{s.layout}] {s.filename}")
+            if s.expected is None:
+                print(f"    expected nothing, got {record!r}")
+            for key, value in (s.expected or {}).items():
+                got = None if record is None else record.get(key)
+                if got != value:
+                    print(f"    {key}: expected {value!r}, got {got!r}")
+            for w in warnings:
+                print(f"  {w}")
+
+    current = {
+        "throughput": {"extract_parse": len(statements) / elapsed,
+                       **{f"parse:{name}": rate for name, rate in rates.items()}},
+        "field_latency": field_latency,
+    }
+    if args.save_baseline:
+        with open(args.baseline, "w") as fp:
+            json.dump(current, fp, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        regressions = []
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            regressions = compare(current, json.load(fp), args.tolerance)
+        print(f"\nRegressions vs baseline (>{args.tolerance:.0%}): {len(regressions)}")
+        for name, old, new in regressions:
+            unit = "us" if name in field_latency else "/s"
+            scale = 1e6 if unit == "us" else 1
+            print(f"  {name:<36}{old * scale:>10.1f} -> {new * scale:.1f} {unit}")
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        regressions = []
+
+    if mismatches or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
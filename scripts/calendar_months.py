@@ -0,0 +1,122 @@
+"""Prorate billing periods onto calendar months and years.
+
+Bills cover irregular spans (16 to 45 days for BWSC), so comparing one bill
+with the next, or with the same bill a year earlier, mixes different numbers
+of days. Each record's usage and charges are spread evenly over the days of
+its period and summed back up by calendar month and year, and the result is
+written to data/<provider>.calendar.json next to the chart summary.
+
+A period runs from `period_start` up to (not including) its end date, where
+the end falls back to `statement_date` when `period_end` is missing, as the
+dashboard labels do. A record with no usable start picks up where the
+previous period ended (or covers the DEFAULT_DAYS before its end if it is the
+first). A start that overlaps the previous period is moved up to that
+period's end, unless that would leave no days at all, so consecutive bills
+sharing a meter-read date aren't counted twice. Gaps are left as gaps: every
+month reports how many of its days are covered.
+
+The work is done with NumPy over all days at once and is skipped when NumPy
+isn't installed.
+"""
+
+import os
+
+from record_store import atomic_write_json
+
+try:
+    import numpy as np
+except ImportError:  # calendar artifacts are optional
+    np = None
+
+DEFAULT_DAYS = 30
+
+
+def _dates(values):
+    return np.array([v or "NaT" for v in values], dtype="datetime64[D]")
+
+
+def _columns(records, fields):
+    """Read `records` once into (end dates, start dates, {field: values}) arrays."""
+    ends, starts, values = [], [], {field: [] for field in fields}
+    for r in records:
+        ends.append(r.get("period_end") or r["statement_date"])
+        starts.append(r.get("period_start"))
+        for field in fields:
+            values[field].append(r[field] or 0)
+    return _dates(ends), _dates(starts), {field: np.array(v, dtype=float) for field, v in values.items()}
+
+
+def _periods(end, start):
+    """Return (order, start, end) with records sorted by end date and non-empty spans."""
+    order = np.argsort(end, kind="stable")
+    end = end[order]
+    start = start[order]
+
+    prev_end = np.empty_like(end)
+    prev_end[0] = np.datetime64("NaT")
+    prev_end[1:] = end[:-1]
+
+    # Unknown or backwards starts: continue from the previous bill, else a default span
+    bad = np.isnat(start) | (start >= end)
+    start = np.where(bad, prev_end, start)
+    bad = np.isnat(start) | (start >= end)
+    start = np.where(bad, end - DEFAULT_DAYS, start)
+
+    # Trim overlap with the previous period when that still leaves at least one day
+    trim = ~np.isnat(prev_end) & (start < prev_end) & (prev_end < end)
+    start = np.where(trim, prev_end, start)
+    return order, start, end
+
+
+def prorate(records, fields):
+    """Spread `fields` over each record's days and total them by calendar month and year.
+
+    Returns {"monthly": {...}, "yearly": {...}}, each a set of parallel
+    arrays: the month ("YYYY-MM") or year, the number of covered days and one
+    total per field. Months from the first to the last covered day are all
+    present, with zeros where no bill covers them. Missing values count as 0.
+    `records` is read once, so it may be any iterable.
+    """
+    end, start, values = _columns(records, fields)
+    order, start, end = _periods(end, start)
+    days = (end - start).astype(int)
+
+    # One entry per billed day, tagged with the record it came from
+    owner = np.repeat(np.arange(len(days)), days)
+    offset = np.arange(owner.size) - np.repeat(np.cumsum(days) - days, days)
+    day = start[owner] + offset
+
+    covered = np.unique(day)
+    result = {}
+    for name, unit in (("monthly", "M"), ("yearly", "Y")):
+        periods = day.astype(f"datetime64[{unit}]")
+        first = periods.min()
+        index = (periods - first).astype(int)
+        size = int(index.max()) + 1
+        labels = np.arange(first, first + size)
+        key = "month" if unit == "M" else "year"
+        table = {
+            key: [str(p) if unit == "M" else int(str(p)) for p in labels],
+            "days": np.bincount((covered.astype(f"datetime64[{unit}]") - first).astype(int),
+                                minlength=size).tolist(),
+        }
+        for field in fields:
+            per_day = (values[field][order] / days)[owner]
+            totals = np.bincount(index, weights=per_day, minlength=size)
+            table[field] = np.round(totals, 2).tolist()
+        result[name] = table
+    return result
+
+
+def calendar_path(json_path):
+    return os.path.splitext(json_path)[0] + ".calendar.json"
+
+
+def write_calendar(provider, json_path, records):
+    """Write the provider's calendar-month totals next to its record file, if possible."""
+    if np is None or provider.summary is None or not records:
+        return None
+    path = calendar_path(json_path)
+    fields = [provider.summary.usage, *provider.summary.costs]
+    atomic_write_json(path, prorate(records, fields), indent=None)
+    return path
@@ -0,0 +1,70 @@
+"""Statement passwords: per-provider configuration and a memo of what worked.
+
+A provider's password list can be replaced without editing its script by
+setting ALBERT_<PROVIDER>_PASSWORDS to a comma-separated list, e.g.
+ALBERT_GAS_110_TUDOR_PASSWORDS="02127,02127-2641".
+
+Whichever password last opened a statement is tried first for the next one
+with the same password list. The memo lives in .cache/passwords.json and
+records only a hash of the list and the winning position in it, never the
+passwords themselves. Text from decrypted statements is kept in the text
+cache, so a statement that is already cached is never decrypted again.
+"""
+
+import hashlib
+import json
+import os
+
+from record_store import atomic_write_json
+
+MEMO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "passwords.json")
+
+_memo = None
+
+
+def configured(name, passwords):
+    """Return the provider's passwords, overridden by ALBERT_<NAME>_PASSWORDS if it is set."""
+    value = os.environ.get(f"ALBERT_{name.upper()}_PASSWORDS")
+    if value is None:
+        return tuple(passwords)
+    return tuple(p.strip() for p in value.split(",") if p.strip())
+
+
+def _key(passwords):
+    return hashlib.sha256("\0".join(passwords).encode()).hexdigest()[:16]
+
+
+def _load():
+    global _memo
+    if _memo is None:
+        try:
+            with open(MEMO_PATH) as fp:
+                _memo = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            _memo = {}
+    return _memo
+
+
+def ordered(passwords):
+    """Return `passwords` with the one that last worked first."""
+    passwords = tuple(passwords)
+    index = _load().get(_key(passwords))
+    if index is None or not 0 < index < len(passwords):
+        return passwords
+    return (passwords[index],) + passwords[:index] + passwords[index + 1:]
+
+
+def remember(passwords, password):
+    """Note that `password` from the list `passwords` opened a statement."""
+    passwords = tuple(passwords)
+    key = _key(passwords)
+    index = passwords.index(password)
+    memo = _load()
+    if memo.get(key) == index:
+        return
+    memo[key] = index
+    try:
+        os.makedirs(os.path.dirname(MEMO_PATH), exist_ok=True)
+        atomic_write_json(MEMO_PATH, memo, indent=None)
+    except OSError:
+        pass  # the memo only saves a retry; never fail an extraction over it
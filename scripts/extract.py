@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Extract usage data for every registered utility provider in one run.
+
+    python scripts/extract.py                      # refresh every provider
+    python scripts/extract.py gas_110_tudor -j 0   # one provider, all CPUs
+    python scripts/extract.py --revalidate -j 0      # what a parser change would change
+    python scripts/extract.py --list
+"""
+
+import argparse
+import os
+import sys
+
+from pipeline import add_pipeline_arguments, check, compact, run
+from providers import load_providers
+from revalidate import revalidate
+from rule_stats import print_rule_stats
+from watch import watch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("providers", nargs="*", help="provider names (default: all)")
+    parser.add_argument("--list", action="store_true", help="list registered providers and exit")
+    parser.add_argument("--compact", action="store_true",
+                        help="rebuild the data/*.json arrays, derived artifacts and records database from the record logs and exit")
+    parser.add_argument("--check", action="store_true",
+                        help="re-check all records for suspicious values and exit")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="re-parse every statement, print the values that would change and exit "
+                             "(1 if any would)")
+    parser.add_argument("--rule-stats", action="store_true",
+                        help="report how often each parse rule produced a field and which never fire, and exit")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and extract statements as they arrive in the provider folders")
+    add_pipeline_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        providers = load_providers(args.providers)
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    if args.list:
+        for provider in providers:
+            print(f"{provider.name:<20} {provider.title}  ->  data/{provider.output}")
+        return
+    if args.compact:
+        compact(providers, args)
+        return
+    if args.check:
+        check(providers, args)
+        return
+    if args.revalidate:
+        if revalidate(providers, args):
+            sys.exit(1)
+        return
+    if args.rule_stats:
+        print_rule_stats(providers, args)
+        return
+
+    if args.watch:
+        if not os.path.isdir(args.business_dir):
+            parser.error("--watch needs --business-dir to be a local folder")
+        watch(providers, args)
+        return
+
+    run(providers, args)
+
+
+if __name__ == "__main__":
+    main()
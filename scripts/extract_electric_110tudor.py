@@ -1,240 +1,158 @@
 #!/usr/bin/env python3
 """Extract electricity usage data from NStar/Eversource statements and generate a chart."""
 
-import pymupdf
-import os
 import re
-import json
-from datetime import datetime
-
-BASE = "/Users/albert/albert_git_repos/albert-business/property_110_tudor_st/service_providers/eversource_electric"
-
-def extract_text_normal(filepath):
-    """Extract text normally from PDF with sort=True for proper column alignment."""
-    doc = pymupdf.open(filepath)
-    text = ""
-    for page in doc:
-        text += page.get_text(sort=True)
-    doc.close()
-    return text
-
-def extract_text_decoded(filepath):
-    """Extract text from garbled PDFs using +29 ASCII offset decoding."""
-    doc = pymupdf.open(filepath)
-    pages_text = []
-    for page in doc:
-        blocks = page.get_text("rawdict")["blocks"]
-        full_text = []
-        for block in blocks:
-            if "lines" in block:
-                for line in block["lines"]:
-                    line_chars = []
-                    for span in line["spans"]:
-                        for c in span.get("chars", []):
-                            code = ord(c["c"])
-                            new_code = code + 29
-                            if new_code > 126:
-                                new_code = new_code - 95
-                            line_chars.append(chr(new_code))
-                    full_text.append("".join(line_chars))
-        pages_text.append("\n".join(full_text))
-    doc.close()
-    return "\n".join(pages_text)
-
-def is_garbled(filepath):
-    """Check if PDF has garbled text."""
-    text = extract_text_normal(filepath)
-    return not ("kWh" in text or "KWH" in text or "Delivery" in text)
 
-def parse_statement(text, filename):
-    """Parse kWh, supply $, and delivery $ from statement text."""
-    result = {"filename": filename, "kwh": None, "supply": None, "delivery": None, "period_start": None, "period_end": None}
-
-    # Extract billing period
-    # Patterns: "June 10, 2009 to June 18, 2009" or "January 20, 2015 to February 17, 2015"
-    # or "Service from 04/17/20 - 05/18/20"
-    period_match = re.search(r'(\w+ \d{1,2}, \d{4})\s+to\s+(\w+ \d{1,2}, \d{4})', text)
-    if period_match:
-        try:
-            result["period_start"] = datetime.strptime(period_match.group(1), "%B %d, %Y").strftime("%Y-%m-%d")
-            result["period_end"] = datetime.strptime(period_match.group(2), "%B %d, %Y").strftime("%Y-%m-%d")
-        except:
-            pass
-
-    if not result["period_end"]:
-        period_match2 = re.search(r'Service from (\d{2}/\d{2}/\d{2})\s*-\s*(\d{2}/\d{2}/\d{2})', text)
-        if period_match2:
-            try:
-                result["period_start"] = datetime.strptime(period_match2.group(1), "%m/%d/%y").strftime("%Y-%m-%d")
-                result["period_end"] = datetime.strptime(period_match2.group(2), "%m/%d/%y").strftime("%Y-%m-%d")
-            except:
-                pass
-
-    if not result["period_end"]:
-        # Try "Service from 12/19/25 - 01/20/26  33 Days" format
-        period_match3 = re.search(r'Service from (\d{2}/\d{2}/\d{2})\s*-\s*(\d{2}/\d{2}/\d{2})\s+\d+ Days', text)
-        if period_match3:
-            try:
-                result["period_start"] = datetime.strptime(period_match3.group(1), "%m/%d/%y").strftime("%Y-%m-%d")
-                result["period_end"] = datetime.strptime(period_match3.group(2), "%m/%d/%y").strftime("%Y-%m-%d")
-            except:
-                pass
-
-    # Normalize text: collapse multi-line tokens for easier matching
-    # Join lines to make patterns easier to match
-    text_joined = re.sub(r'\n', ' ', text)
+from fields import Layout, Rule, classify, date_pair, fill, to_amount, to_int
+from pipeline import main
+from providers import Provider, register
+from records import ElectricRecord
+from summaries import Summary
+from word_index import AMOUNT, WordRule
+
+
+def is_garbled(text):
+    """Check if the first page of a statement is garbled."""
+    return not ("kWh" in text or "KWH" in text or "Delivery" in text)
 
-    # Extract kWh - multiple patterns
+# Billing period: "June 10, 2009 to June 18, 2009", "January 20, 2015 to February 17, 2015"
+# or "Service from 04/17/20 - 05/18/20"
+PERIOD_RULES = [
+    Rule("long_dates", r'(\w+ \d{1,2}, \d{4})\s+to\s+(\w+ \d{1,2}, \d{4})',
+         date_pair("%B %d, %Y"), anchor="to"),
+    Rule("service_from", r'Service from (\d{2}/\d{2}/\d{2})\s*-\s*(\d{2}/\d{2}/\d{2})',
+         date_pair("%m/%d/%y"), anchor="Service from"),
+    # "Service from 12/19/25 - 01/20/26  33 Days"
+    Rule("service_from_days", r'Service from (\d{2}/\d{2}/\d{2})\s*-\s*(\d{2}/\d{2}/\d{2})\s+\d+ Days',
+         date_pair("%m/%d/%y"), anchor="Service from"),
+]
+
+# kWh rules run over the text with newlines joined
+KWH_RULES = [
     # "Total Electricity Use (kWh)" followed by number
-    kwh_match = re.search(r'Total\s+Electricity\s+Use\s*\(kWh\)\s+(\d[\d,]*)', text_joined)
-    if kwh_match:
-        result["kwh"] = int(kwh_match.group(1).replace(",", ""))
-
-    if not result["kwh"]:
-        # "X Day Billed Use  NNN"
-        kwh_match2 = re.search(r'\d+\s+Day\s+Billed\s+Use\s+(\d[\d,]*)', text_joined)
-        if kwh_match2:
-            result["kwh"] = int(kwh_match2.group(1).replace(",", ""))
-
-    if not result["kwh"]:
-        # Current Usage column: look for meter read pattern
-        kwh_match3 = re.search(r'Current\s+Usage.*?(\d[\d,]+)\s+Actual', text_joined)
-        if kwh_match3:
-            result["kwh"] = int(kwh_match3.group(1).replace(",", ""))
-
-    if not result["kwh"]:
-        # "Billed Use NNN Generation" pattern (multi-line joined)
-        kwh_match5 = re.search(r'Billed\s+Use\s+(\d[\d,]+)\s+Generation', text_joined)
-        if kwh_match5:
-            result["kwh"] = int(kwh_match5.group(1).replace(",", ""))
-
-    if not result["kwh"]:
-        # "NNN kWh X .NNNNN" pattern from generation charge line
-        kwh_match4 = re.search(r'Generation\s+(?:Service\s+)?Charge.*?(\d[\d,]+)\s*kWh\s*X', text_joined, re.IGNORECASE)
-        if kwh_match4:
-            result["kwh"] = int(kwh_match4.group(1).replace(",", ""))
-
-    if not result["kwh"]:
-        # Last resort: look for "NNN KWH" pattern near delivery/generation sections
-        kwh_match6 = re.search(r'(\d[\d,]+)\s+KWH\s+.*?Delivery\s+Services', text_joined)
-        if kwh_match6:
-            result["kwh"] = int(kwh_match6.group(1).replace(",", ""))
-
-    if not result["kwh"]:
-        # Fallback: find "NNN KWH  X.XX" in charge line items
-        kwh_match7 = re.search(r'(\d[\d,]*)\s+KWH\s+(\d[\d,]*\.\d{2})', text_joined)
-        if kwh_match7:
-            result["kwh"] = int(kwh_match7.group(1).replace(",", ""))
-
-    # Extract delivery charges
+    Rule("total_electricity_use", r'Total\s+Electricity\s+Use\s*\(kWh\)\s+(\d[\d,]*)', to_int, anchor="Total"),
+    # "X Day Billed Use  NNN"
+    Rule("day_billed_use", r'\d+\s+Day\s+Billed\s+Use\s+(\d[\d,]*)', to_int, anchor="Day"),
+    # Current Usage column: look for meter read pattern
+    Rule("current_usage_actual", r'Current\s+Usage.*?(\d[\d,]+)\s+Actual', to_int, anchor="Current"),
+    # "Billed Use NNN Generation" pattern (multi-line joined)
+    Rule("billed_use_generation", r'Billed\s+Use\s+(\d[\d,]+)\s+Generation', to_int, anchor="Billed"),
+    # "NNN kWh X .NNNNN" pattern from generation charge line
+    Rule("generation_charge_kwh", r'Generation\s+(?:Service\s+)?Charge.*?(\d[\d,]+)\s*kWh\s*X', to_int,
+         flags=re.IGNORECASE),
+    # Last resort: look for "NNN KWH" pattern near delivery/generation sections
+    Rule("kwh_before_delivery", r'(\d[\d,]+)\s+KWH\s+.*?Delivery\s+Services', to_int, anchor="KWH"),
+    # Fallback: find "NNN KWH  X.XX" in charge line items
+    Rule("kwh_charge_line", r'(\d[\d,]*)\s+KWH\s+(\d[\d,]*\.\d{2})', to_int, anchor="KWH"),
+]
+
+DELIVERY_RULES = [
     # "Delivery Charges Total" ... "$XX.XX" or just number
-    delivery_match = re.search(r'Delivery\s*(?:Charges\s*)?Total[\s.]*\$?([\d,]+\.\d{2})', text)
-    if delivery_match:
-        result["delivery"] = float(delivery_match.group(1).replace(",", ""))
-
-    if not result["delivery"]:
-        # "Subtotal Delivery Services" ... "$XX.XX"
-        delivery_match2 = re.search(r'Subtotal Delivery Services\s*\$?([\d,]+\.\d{2})', text)
-        if delivery_match2:
-            result["delivery"] = float(delivery_match2.group(1).replace(",", ""))
-
-    if not result["delivery"]:
-        # "Delivery Services" ... "$XX.XX" in account summary
-        delivery_match3 = re.search(r'Delivery Services\s*\$?([\d,]+\.\d{2})', text)
-        if delivery_match3:
-            result["delivery"] = float(delivery_match3.group(1).replace(",", ""))
-
-    # Extract supply/generation charges
-    gen_match = re.search(r'Generation\s*(?:Charges|Total)[\s.]*\$?([\d,]+\.\d{2})', text)
-    if gen_match:
-        result["supply"] = float(gen_match.group(1).replace(",", ""))
-
-    if not result["supply"]:
-        gen_match2 = re.search(r'Subtotal Supplier Services\s*\$?([\d,]+\.\d{2})', text)
-        if gen_match2:
-            result["supply"] = float(gen_match2.group(1).replace(",", ""))
-
-    if not result["supply"]:
-        gen_match3 = re.search(r'Electric Supply Services\s*\$?([\d,]+\.\d{2})', text)
-        if gen_match3:
-            result["supply"] = float(gen_match3.group(1).replace(",", ""))
-
-    if not result["supply"]:
-        # "Generation Service Charge NNN kWh X .NNNNN $XX.XX"
-        gen_match4 = re.search(r'Generation Service Charge\s+\d[\d,]* kWh X \.\d+\s*\$?([\d,]+\.\d{2})', text)
-        if gen_match4:
-            result["supply"] = float(gen_match4.group(1).replace(",", ""))
-
+    Rule("delivery_total", r'Delivery\s*(?:Charges\s*)?Total[\s.]*\$?([\d,]+\.\d{2})', to_amount, anchor="Delivery"),
+    Rule("subtotal_delivery_services", r'Subtotal Delivery Services\s*\$?([\d,]+\.\d{2})', to_amount,
+         anchor="Subtotal Delivery Services"),
+    # "Delivery Services" ... "$XX.XX" in account summary
+    Rule("delivery_services", r'Delivery Services\s*\$?([\d,]+\.\d{2})', to_amount, anchor="Delivery Services"),
+]
+
+SUPPLY_RULES = [
+    Rule("generation_total", r'Generation\s*(?:Charges|Total)[\s.]*\$?([\d,]+\.\d{2})', to_amount,
+         anchor="Generation"),
+    Rule("subtotal_supplier_services", r'Subtotal Supplier Services\s*\$?([\d,]+\.\d{2})', to_amount,
+         anchor="Subtotal Supplier Services"),
+    Rule("electric_supply_services", r'Electric Supply Services\s*\$?([\d,]+\.\d{2})', to_amount,
+         anchor="Electric Supply Services"),
+    # "Generation Service Charge NNN kWh X .NNNNN $XX.XX"
+    Rule("generation_service_charge", r'Generation Service Charge\s+\d[\d,]* kWh X \.\d+\s*\$?([\d,]+\.\d{2})',
+         to_amount, anchor="Generation Service Charge"),
     # For very early bills (2009) where generation is "Basic Svc Fixed .XXXXX X NN KWH  X.XX"
-    if not result["supply"]:
-        gen_match5 = re.search(r'Basic Svc Fixed\s+\.?\d+\s*X?\s*\d+\s*KWH\s+([\d,]+\.\d{2})', text)
-        if gen_match5:
-            result["supply"] = float(gen_match5.group(1).replace(",", ""))
-
-    return result
-
-
-OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "electric_110_tudor.json")
+    Rule("basic_svc_fixed", r'Basic Svc Fixed\s+\.?\d+\s*X?\s*\d+\s*KWH\s+([\d,]+\.\d{2})', to_amount,
+         anchor="Basic Svc Fixed"),
+]
+
+
+# Rules each bill format's fields come from, tried before the rest of the chains above (see fields.Layout)
+LAYOUTS = [
+    # 2012-2019: "Total Electricity Use (kWh)", subtotals per service
+    Layout("eversource_total_use", ["Total Electricity Use"],
+           {"period": ["long_dates"], "kwh": ["total_electricity_use"],
+            "delivery": ["subtotal_delivery_services"], "supply": ["subtotal_supplier_services"]}),
+    # 2020+: "Service from MM/DD/YY - MM/DD/YY", "NN Day Billed Use"
+    Layout("eversource_service_from", ["Service from"],
+           {"period": ["service_from"], "kwh": ["day_billed_use"],
+            "delivery": ["delivery_services"], "supply": ["electric_supply_services"]}),
+    # 2009 NStar: "Basic Svc Fixed .XXXXX X NN KWH  X.XX"
+    Layout("nstar_basic_svc", ["Basic Svc Fixed"],
+           {"period": ["long_dates"], "kwh": ["kwh_charge_line"],
+            "delivery": ["delivery_total"], "supply": ["basic_svc_fixed"]}),
+]
+
+
+# Labels and the values next to them, for --words
+WORD_RULES = {
+    "period": [
+        WordRule("words_service_from", "Service from", r'(\d{2}/\d{2}/\d{2})\s*-\s*(\d{2}/\d{2}/\d{2})',
+                 date_pair("%m/%d/%y")),
+        WordRule("words_long_dates", "to", r'(\w+ \d{1,2}, \d{4})\s+to\s+(\w+ \d{1,2}, \d{4})',
+                 date_pair("%B %d, %Y"), direction="line"),
+    ],
+    "kwh": [
+        WordRule("words_total_electricity_use", "Total Electricity Use (kWh)", r'(\d[\d,]*)', to_int),
+        WordRule("words_day_billed_use", "Day Billed Use", r'(\d[\d,]*)', to_int),
+    ],
+    "delivery": [
+        WordRule("words_subtotal_delivery_services", "Subtotal Delivery Services", AMOUNT, to_amount),
+        WordRule("words_delivery_services", "Delivery Services", AMOUNT, to_amount),
+        WordRule("words_delivery_charges_total", "Delivery Charges Total", AMOUNT, to_amount),
+    ],
+    "supply": [
+        WordRule("words_subtotal_supplier_services", "Subtotal Supplier Services", AMOUNT, to_amount),
+        WordRule("words_electric_supply_services", "Electric Supply Services", AMOUNT, to_amount),
+    ],
+}
+
+
+def parse_statement(text, filename, fired=None):
+    """Parse kWh, supply $, and delivery $ from statement text.
+
+    If `fired` is a dict, it is filled with the name of the rule that produced each field.
+    """
+    result = ElectricRecord(filename)
+
+    layout = classify(LAYOUTS, text)
+    if fired is not None:
+        fired["layout"] = layout.name if layout else None
+
+    fill(result, ("period_start", "period_end"), PERIOD_RULES, text, fired, layout=layout)
 
+    # Join lines to make patterns easier to match
+    text_joined = text.replace("\n", " ")
 
-def main():
-    all_files = sorted([f for f in os.listdir(BASE) if "Statement" in f and f.endswith(".pdf")])
-
-    # Load existing data and skip already-processed filenames
-    existing = []
-    if os.path.exists(OUTPUT):
-        with open(OUTPUT) as fp:
-            existing = json.load(fp)
-    seen = {r["filename"] for r in existing}
-
-    new_files = [f for f in all_files if f not in seen]
-    if not new_files:
-        print("No new statements found.")
-        return
-
-    new_results = []
-    errors = []
-
-    for f in new_files:
-        filepath = os.path.join(BASE, f)
-        try:
-            garbled = is_garbled(filepath)
-            if garbled:
-                text = extract_text_decoded(filepath)
-            else:
-                text = extract_text_normal(filepath)
-
-            data = parse_statement(text, f)
-
-            # Use filename date as fallback for period
-            date_match = re.match(r'(\d{4}-\d{2}-\d{2})', f)
-            if date_match:
-                data["statement_date"] = date_match.group(1)
-
-            if data["kwh"] is None:
-                errors.append(f"  {f}: no kWh found")
+    fill(result, "kwh", KWH_RULES, text_joined, fired, skip_falsy=True, layout=layout)
+    fill(result, "delivery", DELIVERY_RULES, text, fired, skip_falsy=True, layout=layout)
+    fill(result, "supply", SUPPLY_RULES, text, fired, skip_falsy=True, layout=layout)
 
-            new_results.append(data)
-        except Exception as e:
-            errors.append(f"  {f}: ERROR {e}")
+    return result
 
-    if errors:
-        print("WARNINGS:")
-        for e in errors:
-            print(e)
-        print()
 
-    results = existing + new_results
-    # Output as JSON for charting
-    print(f"New statements processed: {len(new_results)}")
-    print(f"Total statements: {len(results)}")
-    print(f"With kWh data: {sum(1 for r in results if r['kwh'] is not None)}")
-    print(f"With supply data: {sum(1 for r in results if r['supply'] is not None)}")
-    print(f"With delivery data: {sum(1 for r in results if r['delivery'] is not None)}")
+PROVIDER = register(Provider(
+    name="electric_110_tudor",
+    title="110 Tudor St — Electric (Eversource MA)",
+    property="110_tudor_st",
+    utility="electric",
+    source_dir="property_110_tudor_st/service_providers/eversource_electric",
+    output="electric_110_tudor.json",
+    parse_statement=parse_statement,
+    rules={"period": PERIOD_RULES, "kwh": KWH_RULES, "delivery": DELIVERY_RULES, "supply": SUPPLY_RULES},
+    word_rules=WORD_RULES,
+    layouts=LAYOUTS,
+    fields={"kwh": "kWh", "supply": "supply", "delivery": "delivery"},
+    required={"kwh": "kWh"},
+    is_garbled=is_garbled,
+    record=ElectricRecord,
+    summary=Summary("kwh", ("supply", "delivery"), "Kwh"),
+))
 
-    with open(OUTPUT, "w") as fp:
-        json.dump(results, fp, indent=2)
-    print(f"\nData written to {OUTPUT}")
 
 if __name__ == "__main__":
-    main()
+    main([PROVIDER], __doc__)
@@ -1,221 +1,145 @@
 #!/usr/bin/env python3
 """Extract natural gas usage data from National Grid statements for 110 Tudor St."""
 
-import pymupdf
-import os
-import re
-import json
-from datetime import datetime
-
-BASE = "/Users/albert/albert_git_repos/albert-business/property_110_tudor_st/service_providers/national_grid_gas"
-
-
-def extract_text_normal(filepath):
-    doc = pymupdf.open(filepath)
-    if doc.is_encrypted:
-        for pw in ["02127", "02127-2641"]:
-            if doc.authenticate(pw):
-                break
-        else:
-            doc.close()
-            return None
-    text = ""
-    for page in doc:
-        text += page.get_text(sort=True)
-    doc.close()
-    return text
-
-
-def extract_text_decoded(filepath):
-    doc = pymupdf.open(filepath)
-    pages_text = []
-    for page in doc:
-        blocks = page.get_text("rawdict")["blocks"]
-        full_text = []
-        for block in blocks:
-            if "lines" in block:
-                for line in block["lines"]:
-                    line_chars = []
-                    for span in line["spans"]:
-                        for c in span.get("chars", []):
-                            code = ord(c["c"])
-                            new_code = code + 29
-                            if new_code > 126:
-                                new_code = new_code - 95
-                            line_chars.append(chr(new_code))
-                    full_text.append("".join(line_chars))
-        pages_text.append("\n".join(full_text))
-    doc.close()
-    return "\n".join(pages_text)
-
-
-def is_garbled(filepath):
-    doc = pymupdf.open(filepath)
-    if doc.is_encrypted:
-        for pw in ["02127", "02127-2641"]:
-            if doc.authenticate(pw):
-                break
-        else:
-            doc.close()
-            return False  # can't read it at all
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
+from fields import Layout, Rule, classify, date_format, date_pair, fill, to_amount, to_int
+from pipeline import main
+from providers import Provider, register
+from records import GasRecord
+from summaries import Summary
+from word_index import AMOUNT, WordRule
+
+PASSWORDS = ["02127", "02127-2641"]
+
+
+def is_garbled(text):
     return not ("therm" in text.lower() or "Delivery" in text or "DELIVERY" in text)
 
 
-def parse_statement(text, filename):
-    result = {"filename": filename, "therms": None, "supply": None, "delivery": None,
-              "period_start": None, "period_end": None}
+PERIOD_FORMATS = ["%B %d, %Y", "%B %d,%Y", "%b %d, %Y", "%b %d,%Y"]
 
-    text_joined = re.sub(r'\n', ' ', text)
 
-    # --- Extract billing period ---
+def _read_dates(reads):
+    if len(reads) < 2:
+        return None
+    return tuple(sorted(date_format("%m/%d/%Y")(d) for d in reads[:2]))
+
+
+# All rules run over the text with newlines joined
+PERIOD_RULES = [
     # New format: "Oct 1, 2025 to Oct 30, 2025"
-    period_match = re.search(r'(\w+ \d{1,2},?\s*\d{4})\s+to\s+(\w+ \d{1,2},?\s*\d{4})', text_joined)
-    if period_match:
-        for fmt in ["%B %d, %Y", "%B %d,%Y", "%b %d, %Y", "%b %d,%Y"]:
-            try:
-                result["period_start"] = datetime.strptime(period_match.group(1).strip(), fmt).strftime("%Y-%m-%d")
-                result["period_end"] = datetime.strptime(period_match.group(2).strip(), fmt).strftime("%Y-%m-%d")
-                break
-            except:
-                continue
-
-    # Old format: extract from meter read dates like "07/06/2009 reading" and "06/01/2009 reading"
-    if not result["period_end"]:
-        reads = re.findall(r'(\d{2}/\d{2}/\d{4})\s+reading', text_joined)
-        if len(reads) >= 2:
-            try:
-                dates = [datetime.strptime(d, "%m/%d/%Y") for d in reads[:2]]
-                dates.sort()
-                result["period_start"] = dates[0].strftime("%Y-%m-%d")
-                result["period_end"] = dates[1].strftime("%Y-%m-%d")
-            except:
-                pass
-
-    # --- Extract therms ---
+    Rule("date_range", r'(\w+ \d{1,2},?\s*\d{4})\s+to\s+(\w+ \d{1,2},?\s*\d{4})', date_pair(*PERIOD_FORMATS),
+         anchor="to"),
+    # Old format: meter read dates like "07/06/2009 reading" and "06/01/2009 reading"
+    Rule("meter_read_dates", r'(\d{2}/\d{2}/\d{4})\s+reading', _read_dates,
+         anchor="reading", findall=True),
+]
+
+THERMS_RULES = [
     # Old format: "In NN days you used NNN therms"
-    therms_match = re.search(r'In\s+\d+\s+days\s+you\s+used\s+(\d+)\s+therms', text_joined)
-    if therms_match:
-        result["therms"] = int(therms_match.group(1))
-
-    if result["therms"] is None:
-        # Old format: "Total therms used NNN"
-        therms_match2 = re.search(r'Total\s+therms\s+used\s+(\d+)', text_joined)
-        if therms_match2:
-            result["therms"] = int(therms_match2.group(1))
-
-    if result["therms"] is None:
-        # New format: "x NN therms" in charge lines - grab from the first delivery line
-        # Could be fractional: "x 8.77 therms"
-        therms_matches = re.findall(r'x\s+([\d.]+)\s+therms', text_joined)
-        if therms_matches:
-            result["therms"] = round(float(therms_matches[0]))
-
-    if result["therms"] is None:
-        # New format: Therms Used column value (after "Therm Factor = NNN")
-        therms_match3 = re.search(r'Therm\s*Factor\s*=?\s*[\d.]+\s+(\d+)', text_joined)
-        if therms_match3:
-            result["therms"] = int(therms_match3.group(1))
-
-    # --- Extract delivery ---
+    Rule("days_you_used", r'In\s+\d+\s+days\s+you\s+used\s+(\d+)\s+therms', to_int, anchor="In"),
+    # Old format: "Total therms used NNN"
+    Rule("total_therms_used", r'Total\s+therms\s+used\s+(\d+)', to_int, anchor="Total"),
+    # New format: "x NN therms" in charge lines - grab from the first delivery line
+    # Could be fractional: "x 8.77 therms"
+    Rule("x_therms", r'x\s+([\d.]+)\s+therms', lambda m: round(float(m.group(1))), anchor="x"),
+    # New format: Therms Used column value (after "Therm Factor = NNN")
+    Rule("therm_factor", r'Therm\s*Factor\s*=?\s*[\d.]+\s+(\d+)', to_int, anchor="Therm"),
+]
+
+DELIVERY_RULES = [
     # Old format: "GAS DELIVERY CHARGE $XX.XX"
-    delivery_match = re.search(r'GAS\s+DELIVERY\s+CHARGE\s+\$?([\d,]+\.\d{2})', text_joined)
-    if delivery_match:
-        result["delivery"] = float(delivery_match.group(1).replace(",", ""))
-
-    if result["delivery"] is None:
-        # New format: "Total Delivery Services $ XX.XX"
-        delivery_match2 = re.search(r'Total\s+Delivery\s+Services\s+\$?\s*([\d,]+\.\d{2})', text_joined)
-        if delivery_match2:
-            result["delivery"] = float(delivery_match2.group(1).replace(",", ""))
+    Rule("gas_delivery_charge", r'GAS\s+DELIVERY\s+CHARGE\s+\$?([\d,]+\.\d{2})', to_amount, anchor="GAS"),
+    # New format: "Total Delivery Services $ XX.XX"
+    Rule("total_delivery_services", r'Total\s+Delivery\s+Services\s+\$?\s*([\d,]+\.\d{2})', to_amount,
+         anchor="Total"),
+]
 
-    # --- Extract supply ---
+SUPPLY_RULES = [
     # Old format: "GAS SUPPLY CHARGE ... $XX.XX" or "@ $.XXXXX /therm XX.XX"
     # The supply charge value appears after the rate line
-    supply_match = re.search(r'GAS\s+SUPPLY\s+CHARGE.*?(?:@.*?/therm\s+)?\$?([\d,]+\.\d{2})', text_joined)
-    if supply_match:
-        result["supply"] = float(supply_match.group(1).replace(",", ""))
-
-    if result["supply"] is None:
-        # New format: "Total Supply Services $ XX.XX"
-        supply_match2 = re.search(r'Total\s+Supply\s+Services\s+\$?\s*([\d,]+\.\d{2})', text_joined)
-        if supply_match2:
-            result["supply"] = float(supply_match2.group(1).replace(",", ""))
+    Rule("gas_supply_charge", r'GAS\s+SUPPLY\s+CHARGE.*?(?:@.*?/therm\s+)?\$?([\d,]+\.\d{2})', to_amount,
+         anchor="GAS"),
+    # New format: "Total Supply Services $ XX.XX"
+    Rule("total_supply_services", r'Total\s+Supply\s+Services\s+\$?\s*([\d,]+\.\d{2})', to_amount,
+         anchor="Total"),
+]
+
+
+# Rules each bill format's fields come from, tried before the rest of the chains above (see fields.Layout)
+LAYOUTS = [
+    # New format: "Oct 1, 2025 to Oct 30, 2025", "Total Delivery/Supply Services"
+    Layout("ngrid_total_services", ["Total Delivery"],
+           {"period": ["date_range"], "therms": ["x_therms", "therm_factor"],
+            "delivery": ["total_delivery_services"], "supply": ["total_supply_services"]}),
+    # Old format: meter "reading" dates, "In NN days you used", "GAS ... CHARGE"
+    Layout("ngrid_days_you_used", ["reading", "GAS"],
+           {"period": ["meter_read_dates"], "therms": ["days_you_used", "total_therms_used"],
+            "delivery": ["gas_delivery_charge"], "supply": ["gas_supply_charge"]}),
+]
+
+
+# Labels and the values next to them, for --words
+WORD_RULES = {
+    "period": [
+        WordRule("words_date_range", "to", r'(\w+ \d{1,2},?\s*\d{4})\s+to\s+(\w+ \d{1,2},?\s*\d{4})',
+                 date_pair(*PERIOD_FORMATS), direction="line"),
+        WordRule("words_meter_read_dates", "reading", r'(\d{2}/\d{2}/\d{4})\s+reading', _read_dates,
+                 direction="line", findall=True),
+    ],
+    "therms": [
+        WordRule("words_x_therms", "x", r'([\d.]+)\s+therms', lambda m: round(float(m.group(1)))),
+        WordRule("words_days_you_used", "you used", r'(\d+)\s+therms', to_int),
+        WordRule("words_total_therms_used", "Total therms used", r'(\d+)', to_int),
+    ],
+    "delivery": [
+        WordRule("words_total_delivery_services", "Total Delivery Services", AMOUNT, to_amount),
+        WordRule("words_gas_delivery_charge", "GAS DELIVERY CHARGE", AMOUNT, to_amount),
+    ],
+    "supply": [
+        WordRule("words_total_supply_services", "Total Supply Services", AMOUNT, to_amount),
+        # "GAS SUPPLY CHARGE @ $.91234 /therm 83.12"
+        WordRule("words_gas_supply_charge", "GAS SUPPLY CHARGE", r'(?:@\s*\S+\s*/therm\s+)?' + AMOUNT, to_amount),
+    ],
+}
+
+
+def parse_statement(text, filename, fired=None):
+    result = GasRecord(filename)
+
+    text_joined = text.replace("\n", " ")
+
+    layout = classify(LAYOUTS, text)
+    if fired is not None:
+        fired["layout"] = layout.name if layout else None
+
+    fill(result, ("period_start", "period_end"), PERIOD_RULES, text_joined, fired, layout=layout)
+    fill(result, "therms", THERMS_RULES, text_joined, fired, layout=layout)
+    fill(result, "delivery", DELIVERY_RULES, text_joined, fired, layout=layout)
+    fill(result, "supply", SUPPLY_RULES, text_joined, fired, layout=layout)
 
     return result
 
 
-OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "gas_110_tudor.json")
-
-
-def main():
-    all_files = sorted([f for f in os.listdir(BASE) if "Statement" in f and f.endswith(".pdf")])
-
-    # Load existing data and skip already-processed filenames
-    existing = []
-    if os.path.exists(OUTPUT):
-        with open(OUTPUT) as fp:
-            existing = json.load(fp)
-    seen = {r["filename"] for r in existing}
-
-    new_files = [f for f in all_files if f not in seen]
-    if not new_files:
-        print("No new statements found.")
-        return
-
-    new_results = []
-    errors = []
-
-    for f in new_files:
-        filepath = os.path.join(BASE, f)
-        try:
-            garbled = is_garbled(filepath)
-            if garbled:
-                text = extract_text_decoded(filepath)
-            else:
-                text = extract_text_normal(filepath)
-
-            if text is None:
-                errors.append(f"  {f}: could not decrypt")
-                continue
-
-            data = parse_statement(text, f)
-
-            date_match = re.match(r'(\d{4}-\d{2}-\d{2})', f)
-            if date_match:
-                data["statement_date"] = date_match.group(1)
-
-            if data["therms"] is None:
-                errors.append(f"  {f}: no therms found")
-            if data["supply"] is None:
-                errors.append(f"  {f}: no supply found")
-            if data["delivery"] is None:
-                errors.append(f"  {f}: no delivery found")
-
-            new_results.append(data)
-        except Exception as e:
-            errors.append(f"  {f}: ERROR {e}")
-
-    if errors:
-        print("WARNINGS:")
-        for e in errors:
-            print(e)
-        print()
-
-    results = existing + new_results
-    print(f"New statements processed: {len(new_results)}")
-    print(f"Total statements: {len(results)}")
-    print(f"With therms data: {sum(1 for r in results if r['therms'] is not None)}")
-    print(f"With supply data: {sum(1 for r in results if r['supply'] is not None)}")
-    print(f"With delivery data: {sum(1 for r in results if r['delivery'] is not None)}")
-
-    with open(OUTPUT, "w") as fp:
-        json.dump(results, fp, indent=2)
-    print(f"\nData written to {OUTPUT}")
+PROVIDER = register(Provider(
+    name="gas_110_tudor",
+    title="110 Tudor St — Gas (National Grid)",
+    property="110_tudor_st",
+    utility="gas",
+    source_dir="property_110_tudor_st/service_providers/national_grid_gas",
+    output="gas_110_tudor.json",
+    parse_statement=parse_statement,
+    rules={"period": PERIOD_RULES, "therms": THERMS_RULES, "delivery": DELIVERY_RULES, "supply": SUPPLY_RULES},
+    word_rules=WORD_RULES,
+    layouts=LAYOUTS,
+    fields={"therms": "therms", "supply": "supply", "delivery": "delivery"},
+    required={"therms": "therms", "supply": "supply", "delivery": "delivery"},
+    is_garbled=is_garbled,
+    passwords=PASSWORDS,
+    unreadable="could not decrypt",
+    record=GasRecord,
+    summary=Summary("therms", ("supply", "delivery"), "Therm", "Therms"),
+))
 
 
 if __name__ == "__main__":
-    main()
+    main([PROVIDER], __doc__)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""Extract service events from dealer and shop invoices into data/vehicle_*.json.
+
+    python scripts/extract_vehicles.py                  # every vehicle
+    python scripts/extract_vehicles.py tesla_model3 -j 0
+
+Each vehicle's invoice PDFs are filed under its folder in auto-all, next to
+its other paperwork; only PDFs named like an invoice, receipt or repair order
+are read. Every new invoice is read for its date, odometer, shop, total and
+services, and the resulting event is merged into the vehicle's file in date
+order next to the purchase and any events entered by hand. An invoice with
+no date or odometer reading (the dashboard charts every event's miles), or
+with neither a shop nor a total, adds nothing. An invoice whose
+date and total (or odometer) match an event already in the file is taken to
+be that event.
+
+Invoices are extracted in parallel like statements, sharing the text cache.
+Each vehicle keeps an index in .cache/vehicles/<name>.json of the invoices it
+has turned into events (filename -> content hash) and the event parsed from
+each hash, so a run only opens invoices it has no event for (an invoice that
+gave none is read again next time, after a parser fix), and a renamed or
+re-downloaded copy of a known invoice doesn't add its event twice.
+"""
+
+import argparse
+import json
+import os
+import re
+
+import ingest
+from fields import DateFormat, Rule, fill, to_amount, to_int
+from pipeline import DATA_DIR, TIMEOUT
+from providers import BUSINESS_DIR
+from record_db import RecordDB
+from record_store import atomic_write_json
+from statements import extract_text
+from text_cache import TextCache, content_hash
+
+INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "vehicles")
+INDEX_VERSION = 2
+
+
+class Vehicle:
+    def __init__(self, name, title, source_dir, output):
+        self.name = name
+        self.title = title
+        self.source_dir = source_dir
+        self.output = output
+
+
+VEHICLES = [
+    Vehicle("nissan_rogue", "2018 Nissan Rogue AWD", "auto-all/2018_nissan_rogue", "vehicle_nissan_rogue.json"),
+    Vehicle("tesla_model3", "2023 Tesla Model 3 LR AWD", "auto-all/2023_tesla_model3", "vehicle_tesla_model3.json"),
+]
+
+
+def _date(*formats):
+    parse = DateFormat(*formats)
+
+    def convert(m):
+        return parse(" ".join(m.group(1).replace(",", ", ").split()))
+    return convert
+
+
+DATE_RULES = [
+    # "Invoice Date: 05/30/2023", "Date 5/30/23"
+    Rule("date_slash", r'Date\s*:?\s*(\d{1,2}/\d{1,2}/\d{2,4})\b', _date("%m/%d/%Y", "%m/%d/%y"),
+         flags=re.I),
+    # "Date: May 30, 2023"
+    Rule("date_month_name", r'Date\s*:?\s*([A-Z][a-z]+\.? \d{1,2},?\s*\d{4})', _date("%B %d, %Y", "%b %d, %Y"),
+         flags=re.I),
+    # "2023-05-30"
+    Rule("date_iso", r'\b(\d{4}-\d{2}-\d{2})\b', _date("%Y-%m-%d")),
+]
+
+MILES_RULES = [
+    # "Mileage In: 63,444", "Odometer 63444", "Miles In 63,444"
+    Rule("mileage_in", r'(?:Mileage|Miles|Odometer|Odo)\s*(?:In)?\s*[:#]?\s*(\d{1,3}(?:,\d{3})+|\d{3,7})\b', to_int,
+         flags=re.I),
+    # "63,444 mi"
+    Rule("miles_suffix", r'\b(\d{1,3}(?:,\d{3})+|\d{4,7})\s*(?:mi|miles)\b', to_int, flags=re.I),
+]
+
+COST_RULES = [
+    Rule("total_due", r'(?:Total|Amount|Balance)\s+Due\s*:?\s*\$?\s*([\d,]+\.\d{2})', to_amount, flags=re.I),
+    Rule("invoice_total", r'(?:Invoice|Grand|Customer)\s+Total\s*:?\s*\$?\s*([\d,]+\.\d{2})', to_amount,
+         flags=re.I),
+    Rule("please_pay", r'Please\s+Pay\s*:?\s*\$?\s*([\d,]+\.\d{2})', to_amount, flags=re.I),
+    Rule("total", r'\bTotal\s*:?\s*\$?\s*([\d,]+\.\d{2})', to_amount, flags=re.I),
+]
+
+SERVICE_RULES = [
+    # One line after a "Description:" / "Work Performed:" heading
+    Rule("description", r'(?:Description|Work\s+Performed|Services?\s+Performed)\s*:?[ \t]*\n?[ \t]*([^\n]+)',
+         lambda m: m.group(1).strip() or None, flags=re.I),
+]
+
+# Shops that have serviced the cars, by a name printed on their invoices
+SHOPS = [
+    ("Team Nissan", "Team Nissan, Manchester NH"),
+    ("Meineke", "Meineke, Manchester NH"),
+    ("Precision Imports", "Precision Imports, Manchester NH"),
+    ("HM Motor Works", "HM Motor Works, Bedford NH"),
+    ("AutoFair Honda", "AutoFair Honda, Manchester NH"),
+    ("AutoFair Ford", "AutoFair Ford, Manchester NH"),
+    ("Sullivan Tire", "Sullivan Tire, Bedford NH"),
+    ("Auto World", "Auto World, Manchester NH"),
+    ("Tesla", "Tesla, Londonderry NH"),
+]
+
+PROVIDER_RULES = [Rule(marker, re.escape(marker), lambda m, shop=shop: shop, flags=re.I) for marker, shop in SHOPS]
+
+# Category, its label and the words that put an invoice in it, in label order
+CATEGORIES = [
+    ("inspection", "Inspection", r'inspection'),
+    ("oil_change", "Oil Change", r'oil\s*(?:&|and)?\s*filter|oil\s+change'),
+    ("tires", "Tires", r'\btires?\b(?!\s+pressure)|rotation|changeover'),
+    ("alignment", "Alignment", r'alignment'),
+    ("brakes", "Brakes", r'brake\s+(?:pads?|rotors?|calipers?|service|inspection)|calipers?'),
+    ("battery", "Battery", r'battery'),
+    ("fluids", "Fluids", r'fluid|flush|coolant'),
+    ("filters", "Filters", r'(?:air|cabin|hvac)\s+filters?'),
+    ("drivetrain", "Drivetrain", r'differential|drive\s*shaft|axle|transfer\s+case'),
+    ("suspension", "Suspension", r'tie\s+rods?|strut|shock|control\s+arm'),
+    ("belts", "Belts", r'\bbelt\b'),
+    ("electrical", "Electrical", r'bulbs?|fuse|wiring'),
+]
+CATEGORY_PATTERNS = [(name, label, re.compile(pattern, re.I)) for name, label, pattern in CATEGORIES]
+
+
+# Filenames of invoices, as opposed to registrations, insurance declarations, ...
+INVOICE_NAME = re.compile(r'invoice|receipt|repair\s*order|work\s*order|service|\bRO\b', re.I)
+
+
+def is_invoice(filename):
+    return filename.lower().endswith(".pdf") and INVOICE_NAME.search(filename) is not None
+
+
+def categorize(text):
+    return [name for name, _, pattern in CATEGORY_PATTERNS if pattern.search(text)]
+
+
+def describe(categories):
+    labels = dict((name, label) for name, label, _ in CATEGORIES)
+    return " & ".join(labels[c] for c in categories) or "Service"
+
+
+def parse_invoice(text, filename, fired=None):
+    """Return a service event for one invoice, in the key order of the vehicle files."""
+    found = {"date": None, "miles": None, "provider": None, "service": None, "cost": None}
+    text_joined = text.replace("\n", " ")
+
+    fill(found, "date", DATE_RULES, text_joined, fired)
+    fill(found, "miles", MILES_RULES, text_joined, fired)
+    fill(found, "provider", PROVIDER_RULES, text_joined, fired)
+    fill(found, "service", SERVICE_RULES, text, fired)
+    fill(found, "cost", COST_RULES, text_joined, fired)
+
+    if found["date"] is None:
+        date_match = re.match(r'(\d{4}-\d{2}-\d{2})', filename)
+        if date_match:
+            found["date"] = date_match.group(1)
+
+    categories = categorize(found["service"] or text_joined)
+    label = describe(categories)
+    service = found["service"] or label
+    detail = " — ".join(part for part in (
+        found["provider"], service, None if found["cost"] is None else f"${found['cost']:,.2f}") if part)
+    return {"date": found["date"], "miles": found["miles"], "label": label, "detail": detail,
+            "is_purchase": False, "provider": found["provider"], "service": service, "cost": found["cost"],
+            "categories": categories}
+
+
+def _parse_one(task, data):
+    """Parse one fetched (vehicle, subdir, filename, cache) task; returns (event, warnings, digest).
+
+    The shape matches a failed read in ingest.fetch_and_process: (None, [warning], None).
+    """
+    _, _, filename, cache = task
+    try:
+        digest = content_hash(data)
+        text = extract_text(filename, cache=cache, data=data)
+        if text is None:
+            return None, [f"  {filename}: could not read"], digest
+        event = parse_invoice(text, filename)
+    except Exception as e:
+        return None, [f"  {filename}: ERROR {e}"], None
+    warnings = [f"  {filename}: no {label} found"
+                for key, label in (("provider", "shop"), ("cost", "total"))
+                if event[key] is None]
+    if event["date"] is None:
+        return None, [f"  {filename}: no date found, skipped"], digest
+    if event["miles"] is None:
+        return None, [f"  {filename}: no odometer found, skipped"], digest
+    if event["provider"] is None and event["cost"] is None:
+        return None, [f"  {filename}: no shop or total found, skipped"], digest
+    return event, warnings, digest
+
+
+def _same_event(a, b):
+    return a["date"] == b["date"] and (
+        (a.get("cost") is not None and a.get("cost") == b.get("cost"))
+        or (a.get("miles") is not None and a.get("miles") == b.get("miles")))
+
+
+def merge_events(events, new_events):
+    """Add the events that aren't already in `events` and return (events in date order, added count)."""
+    merged = list(events)
+    added = 0
+    for event in new_events:
+        if any(_same_event(event, e) for e in merged):
+            continue
+        merged.append(event)
+        added += 1
+    # Stable: same-day events keep the order they were entered in
+    merged.sort(key=lambda e: e["date"])
+    return merged, added
+
+
+class InvoiceIndex:
+    """A vehicle's invoices that gave an event (filename -> content hash) and the event parsed from each hash."""
+
+    def __init__(self, name, directory=INDEX_DIR):
+        self.path = os.path.join(directory, name + ".json")
+        try:
+            with open(self.path) as fp:
+                state = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            state = {}
+        if state.get("version") != INDEX_VERSION:
+            state = {}
+        self.files = state.get("files", {})
+        self.events = state.get("events", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write_json(self.path, {"version": INDEX_VERSION, "files": self.files, "events": self.events},
+                          indent=None)
+
+
+def run(vehicles, args):
+    cache = None if args.no_cache else TextCache()
+    source = ingest.open_source(args.business_dir)
+    jobs = args.jobs or os.cpu_count() or 1
+    plans = []
+    tasks = []
+    for vehicle in vehicles:
+        index = InvoiceIndex(vehicle.name)
+        try:
+            names = source.list(vehicle.source_dir)
+        except FileNotFoundError:
+            names = []
+        new_files = sorted(f for f in names if is_invoice(f) and f not in index.files)
+        plans.append((vehicle, index, len(new_files)))
+        tasks.extend((vehicle, vehicle.source_dir, f, cache) for f in new_files)
+
+    outcomes = ingest.fetch_and_process(source, tasks, _parse_one, jobs, args.prefetch,
+                                       timeout=args.timeout or None)
+    if cache is not None:
+        cache.prune()
+
+    changed = False
+    for vehicle, index, count in plans:
+        if len(vehicles) > 1:
+            print(f"== {vehicle.title}")
+        file_tasks, tasks = tasks[:count], tasks[count:]
+        file_outcomes, outcomes = outcomes[:count], outcomes[count:]
+        if not count:
+            print("No new invoices found.")
+            continue
+
+        new_events = []
+        errors = []
+        for (_, _, filename, _), (event, warnings, digest) in zip(file_tasks, file_outcomes):
+            errors.extend(warnings)
+            if event is None:
+                continue  # try again next run
+            if digest not in index.events:
+                new_events.append(event)
+            index.events.setdefault(digest, event)
+            index.files[filename] = digest
+
+        path = os.path.join(args.data_dir, vehicle.output)
+        with open(path) as fp:
+            data = json.load(fp)
+        data["events"], added = merge_events(data["events"], new_events)
+        if added:
+            atomic_write_json(path, data, indent=2)
+            changed = True
+        index.save()
+
+        if errors:
+            print("WARNINGS:")
+            for e in errors:
+                print(e)
+            print()
+        print(f"New invoices processed: {count}")
+        print(f"Events added: {added}")
+        print(f"Total events: {len(data['events'])}")
+        print(f"\nData written to {path}")
+
+    if changed:
+        with RecordDB(args.data_dir) as db:
+            db.replace_vehicles(args.data_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("vehicles", nargs="*", help="vehicle names (default: all)")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="number of worker processes (0 = one per CPU)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't read or write the extracted-text cache")
+    parser.add_argument("--business-dir", default=BUSINESS_DIR,
+                        help="root of the albert-business repo: a folder, a .zip/.tar archive or s3://bucket/prefix "
+                             "(default: $ALBERT_BUSINESS_DIR)")
+    parser.add_argument("--prefetch", type=int, default=ingest.PREFETCH,
+                        help="invoices read ahead of extraction (default: %(default)s)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where the vehicle JSON files are")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help="seconds before an invoice is given up on and its worker killed "
+                             "(0 = no limit, default: %(default)s)")
+    args = parser.parse_args()
+
+    by_name = {v.name: v for v in VEHICLES}
+    unknown = [n for n in args.vehicles if n not in by_name]
+    if unknown:
+        parser.error(f"unknown vehicle(s): {', '.join(unknown)} (known: {', '.join(by_name)})")
+    run([by_name[n] for n in args.vehicles] or VEHICLES, args)
+
+
+if __name__ == "__main__":
+    main()
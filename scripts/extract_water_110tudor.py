@@ -1,220 +1,197 @@
 #!/usr/bin/env python3
 """Extract water usage data from BWSC statements for 110 Tudor St."""
 
-import pymupdf
-import os
 import re
-import json
-from datetime import datetime
 
-BASE = "/Users/albert/albert_git_repos/albert-business/property_110_tudor_st/service_providers/boston_water_sewer"
+from fields import DateFormat, Layout, Rule, classify, fill, first_match, normalize_date, to_amount, to_int
+from pipeline import main
+from providers import Provider, register
+from records import WaterRecord
+from summaries import Summary
+from word_index import AMOUNT, WordRule
 
 
-def extract_text(filepath):
-    doc = pymupdf.open(filepath)
-    text = ""
-    for page in doc:
-        text += page.get_text(sort=True)
-    doc.close()
-    return text
+def _bill_dates(found):
+    dates = {}
+    for label, date in found:
+        dates.setdefault(label, date)
+    if "Previous" not in dates or "Current" not in dates:
+        return None
+    return (normalize_date(dates["Previous"], "%m/%d/%Y"), normalize_date(dates["Current"], "%m/%d/%Y"))
 
 
-def parse_statement(text, filename):
-    result = {"filename": filename, "cf": None, "water": None, "sewer": None,
-              "period_start": None, "period_end": None}
+HEADER_DATE = DateFormat("%m/%d/%Y", "%m/%d/%y")
 
-    text_joined = re.sub(r'\n', ' ', text)
 
-    # --- Extract billing period ---
+def _header_dates(m):
+    dates = []
+    for g in m.groups():
+        if '/' in g:
+            try:
+                dates.append(HEADER_DATE(g))
+            except ValueError:
+                continue
+    if len(dates) < 2:
+        return None
+    dates.sort()
+    return (dates[0], dates[1])
+
+
+def _meter_read_diff(reads):
+    if len(reads) < 2:
+        return None
+    diff = abs(int(reads[0]) - int(reads[1]))
+    return diff if 0 < diff < 5000 else None
+
+
+def _reasonable_charge(m):
+    # sanity check - water/sewer charge should be reasonable
+    val = float(m.group(1).replace(",", ""))
+    return val if val < 200 else None
+
+
+# All rules run over the text with newlines joined
+PERIOD_RULES = [
     # New format (Oct 2019+): "Previous Bill Date MM/DD/YYYY" and "Current Bill Date MM/DD/YYYY"
-    prev_date = re.search(r'Previous\s+Bill\s+Date\s+(\d{2}/\d{2}/\d{4})', text_joined)
-    curr_date = re.search(r'Current\s+Bill\s+Date\s+(\d{2}/\d{2}/\d{4})', text_joined)
-    if prev_date and curr_date:
-        try:
-            result["period_start"] = datetime.strptime(prev_date.group(1), "%m/%d/%Y").strftime("%Y-%m-%d")
-            result["period_end"] = datetime.strptime(curr_date.group(1), "%m/%d/%Y").strftime("%Y-%m-%d")
-        except:
-            pass
-
-    # Old format (2009-Sep 2019): "NN DAYS MM/DD/YY ... MM/DD/YY"
-    if not result["period_end"]:
-        # Look for billing period dates in the header area
-        period_match = re.search(r'(\d{2}/\d{2}/\d{2,4})\s+.*?(\d{2}/\d{2}/\d{2,4})\s+.*?(\d+)\s+DAYS', text_joined)
-        if not period_match:
-            period_match = re.search(r'(\d+)\s+DAYS\s+(\d{2}/\d{2}/\d{2,4})\s+.*?(\d{2}/\d{2}/\d{2,4})', text_joined)
-        if period_match:
-            groups = period_match.groups()
-            dates = []
-            for g in groups:
-                if '/' in g:
-                    for fmt in ["%m/%d/%Y", "%m/%d/%y"]:
-                        try:
-                            dates.append(datetime.strptime(g, fmt))
-                            break
-                        except:
-                            continue
-            if len(dates) >= 2:
-                dates.sort()
-                result["period_start"] = dates[0].strftime("%Y-%m-%d")
-                result["period_end"] = dates[1].strftime("%Y-%m-%d")
-
-    # --- Extract consumption (cubic feet) ---
+    Rule("bill_dates", r'(Previous|Current)\s+Bill\s+Date\s+(\d{2}/\d{2}/\d{4})', _bill_dates,
+         anchor="Bill", findall=True),
+    # Old format (2009-Sep 2019): "NN DAYS MM/DD/YY ... MM/DD/YY" in the header area
+    Rule("dates_then_days", r'(\d{2}/\d{2}/\d{2,4})\s+.*?(\d{2}/\d{2}/\d{2,4})\s+.*?(\d+)\s+DAYS', _header_dates,
+         anchor="DAYS"),
+    Rule("days_then_dates", r'(\d+)\s+DAYS\s+(\d{2}/\d{2}/\d{2,4})\s+.*?(\d{2}/\d{2}/\d{2,4})', _header_dates,
+         anchor="DAYS"),
+]
+
+CF_RULES = [
     # New format: "Current Service Period (NN Days) NNN CF"
-    cf_match = re.search(r'Current\s+Service\s+Period\s*\(\d+\s*Days?\)\s+(\d[\d,]*)\s*CF', text_joined)
-    if cf_match:
-        result["cf"] = int(cf_match.group(1).replace(",", ""))
-
+    Rule("current_service_period", r'Current\s+Service\s+Period\s*\(\d+\s*Days?\)\s+(\d[\d,]*)\s*CF', to_int,
+         anchor="Current"),
     # Old format: "cubic feet NNN" or "cubic feel NNN" (OCR error) or "cubicfeet NNN"
-    if result["cf"] is None:
-        cf_match2 = re.search(r'cubic\s*fee[tl]\s+(\d[\d,]*)', text_joined, re.IGNORECASE)
-        if cf_match2:
-            result["cf"] = int(cf_match2.group(1).replace(",", ""))
-
+    Rule("cubic_feet", r'cubic\s*fee[tl]\s+(\d[\d,]*)', to_int, flags=re.IGNORECASE),
     # Fallback: derive from gallons (gallons / 7.481 = CF)
-    if result["cf"] is None:
-        gal_match = re.search(r'gallons\s+([\d,]+\.\d+)', text_joined, re.IGNORECASE)
-        if gal_match:
-            gallons = float(gal_match.group(1).replace(",", ""))
-            result["cf"] = round(gallons / 7.481)
-
+    Rule("gallons", r'gallons\s+([\d,]+\.\d+)', lambda m: round(float(m.group(1).replace(",", "")) / 7.481),
+         flags=re.IGNORECASE),
     # Fallback: meter read subtraction
-    if result["cf"] is None:
-        reads = re.findall(r'(?:^|\s)(\d{5})(?:\s|$)', text_joined)
-        if len(reads) >= 2:
-            try:
-                r1, r2 = int(reads[0]), int(reads[1])
-                diff = abs(r1 - r2)
-                if 0 < diff < 5000:
-                    result["cf"] = diff
-            except:
-                pass
-
-    # --- Extract water charge ---
+    Rule("meter_read_diff", r'(?:^|\s)(\d{5})(?:\s|$)', _meter_read_diff, findall=True),
+]
+
+WATER_RULES = [
     # Old format: "WATER XX.XX" (uppercase, may have spaces in amount like "27. 59")
-    water_match = re.search(r'WATER\s+\$?\s*(\d[\d,]*\s*\.\s*\d{2})', text_joined)
-    if water_match:
-        result["water"] = float(water_match.group(1).replace(",", "").replace(" ", ""))
-
-    if result["water"] is None:
-        # Reversed: "XX.XX ... WATER" (amount before label due to garbled layout)
-        water_rev = re.search(r'(\d[\d,]*\.\d{2})\s+[^A-Z]*WATER', text_joined)
-        if water_rev:
-            val = float(water_rev.group(1).replace(",", ""))
-            if val < 200:  # sanity check - water charge should be reasonable
-                result["water"] = val
-
-    if result["water"] is None:
-        # New format: "Water $XX.XX" or "Water  _ $XX.XX" (with artifacts)
-        water_match2 = re.search(r'Water\s+[^$\d]*\$\s*([\d,]+\.\d{2})', text_joined)
-        if water_match2:
-            result["water"] = float(water_match2.group(1).replace(",", ""))
-
-    # --- Extract sewer charge ---
+    Rule("water_upper", r'WATER\s+\$?\s*(\d[\d,]*\s*\.\s*\d{2})', to_amount, anchor="WATER"),
+    # Reversed: "XX.XX ... WATER" (amount before label due to garbled layout)
+    Rule("water_reversed", r'(\d[\d,]*\.\d{2})\s+[^A-Z]*WATER', _reasonable_charge, anchor="WATER"),
+    # New format: "Water $XX.XX" or "Water  _ $XX.XX" (with artifacts)
+    Rule("water_dollar", r'Water\s+[^$\d]*\$\s*([\d,]+\.\d{2})', to_amount, anchor="Water"),
+]
+
+SEWER_RULES = [
     # Old format: "SEWER XX.XX" (may have spaces in amount like "13 .64")
-    sewer_match = re.search(r'SEWER\s+\$?\s*(\d[\d,]*\s*\.\s*\d{2})', text_joined)
-    if sewer_match:
-        result["sewer"] = float(sewer_match.group(1).replace(",", "").replace(" ", ""))
-
-    if result["sewer"] is None:
-        # Reversed: "XX.XX ... SEWER" (amount before label due to garbled layout)
-        sewer_rev = re.search(r'(\d[\d,]*\.\d{2})\s+[^A-Z]*SEWER', text_joined)
-        if sewer_rev:
-            val = float(sewer_rev.group(1).replace(",", ""))
-            if val < 200:
-                result["sewer"] = val
-
-    if result["sewer"] is None:
-        # New format: "Sewer $XX.XX" (with possible artifacts before $)
-        sewer_match2 = re.search(r'Sewer\s+[^$\d]*\$\s*([\d,]+\.\d{2})', text_joined)
-        if sewer_match2:
-            result["sewer"] = float(sewer_match2.group(1).replace(",", ""))
+    Rule("sewer_upper", r'SEWER\s+\$?\s*(\d[\d,]*\s*\.\s*\d{2})', to_amount, anchor="SEWER"),
+    # Reversed: "XX.XX ... SEWER" (amount before label due to garbled layout)
+    Rule("sewer_reversed", r'(\d[\d,]*\.\d{2})\s+[^A-Z]*SEWER', _reasonable_charge, anchor="SEWER"),
+    # New format: "Sewer $XX.XX" (with possible artifacts before $)
+    Rule("sewer_dollar", r'Sewer\s+[^$\d]*\$\s*([\d,]+\.\d{2})', to_amount, anchor="Sewer"),
+]
+
+# The amount may be far from the label with dots/chars in between, and may have spaces in amount
+TOTAL_RULES = [
+    Rule("total_charges", r'TOTAL\s+(?:CURRENT\s+CHARGES|SERVICE\s+CHARGES).*?\$\s*([\d,]+\s*\.\s*\d{2})',
+         to_amount, anchor="TOTAL"),
+    # Some bills only have "TOTAL AMOUNTDUE" or "TOTAL AMOUNT DUE"
+    Rule("total_amount_due", r'TOTAL\s+AMOUNT\s*DUE.*?\$\s*([\d,]+\s*\.\s*\d{2})', to_amount, anchor="TOTAL"),
+]
+
+
+# Rules each bill format's fields come from, tried before the rest of the chains above (see fields.Layout)
+LAYOUTS = [
+    # New format (Oct 2019+): "Previous/Current Bill Date", "Current Service Period", "Water $XX.XX"
+    Layout("bwsc_bill_dates", ["Bill Date"],
+           {"period": ["bill_dates"], "cf": ["current_service_period"],
+            "water": ["water_dollar"], "sewer": ["sewer_dollar"]}),
+    # Old format (2009-Sep 2019): "NN DAYS" header, "cubic feet", "WATER XX.XX"
+    Layout("bwsc_days_header", ["DAYS", "WATER"],
+           {"period": ["dates_then_days", "days_then_dates"], "cf": ["cubic_feet"],
+            "water": ["water_upper"], "sewer": ["sewer_upper"]}),
+]
+
+
+# Labels and the values next to them, for --words. Split amounts ("27. 59")
+# and amounts printed away from their label need no special rules here.
+WORD_RULES = {
+    "period": [
+        WordRule("words_bill_dates", "Bill Date", r'(Previous|Current)\s+Bill\s+Date\s+(\d{2}/\d{2}/\d{4})',
+                 _bill_dates, direction="line", findall=True),
+        WordRule("words_days_header", "DAYS", r'(\d{2}/\d{2}/\d{2,4})\s+(\d{2}/\d{2}/\d{2,4})\s+(\d+)\s+DAYS',
+                 _header_dates, direction="line"),
+    ],
+    "cf": [
+        WordRule("words_current_service_period", "Current Service Period", r'\(\d+\s*Days?\)\s+(\d[\d,]*)\s*CF',
+                 to_int),
+        WordRule("words_cubic_feet", "cubic feet", r'(\d[\d,]*)', to_int),
+    ],
+    "water": [
+        WordRule("words_water_upper", "WATER", AMOUNT, to_amount),
+        WordRule("words_water_dollar", "Water", r'[^$\d]*' + AMOUNT, to_amount),
+    ],
+    "sewer": [
+        WordRule("words_sewer_upper", "SEWER", AMOUNT, to_amount),
+        WordRule("words_sewer_dollar", "Sewer", r'[^$\d]*' + AMOUNT, to_amount),
+    ],
+}
+
+
+def parse_statement(text, filename, fired=None):
+    result = WaterRecord(filename)
+
+    text_joined = text.replace("\n", " ")
+
+    layout = classify(LAYOUTS, text)
+    if fired is not None:
+        fired["layout"] = layout.name if layout else None
+
+    fill(result, ("period_start", "period_end"), PERIOD_RULES, text_joined, fired, layout=layout)
+    fill(result, "cf", CF_RULES, text_joined, fired, layout=layout)
+    fill(result, "water", WATER_RULES, text_joined, fired, layout=layout)
+    fill(result, "sewer", SEWER_RULES, text_joined, fired, layout=layout)
 
     # --- Fallback: derive missing water or sewer from total ---
     if result["water"] is None or result["sewer"] is None:
-        # Match TOTAL CURRENT CHARGES or TOTAL SERVICE CHARGES
-        # The amount may be far from the label with dots/chars in between, and may have spaces in amount
-        total_match = re.search(r'TOTAL\s+(?:CURRENT\s+CHARGES|SERVICE\s+CHARGES).*?\$\s*([\d,]+\s*\.\s*\d{2})', text_joined)
-        if not total_match:
-            # Some bills only have "TOTAL AMOUNTDUE" or "TOTAL AMOUNT DUE"
-            total_match = re.search(r'TOTAL\s+AMOUNT\s*DUE.*?\$\s*([\d,]+\s*\.\s*\d{2})', text_joined)
-        if total_match:
-            total = float(total_match.group(1).replace(",", "").replace(" ", ""))
+        total, rule = first_match(TOTAL_RULES, text_joined)
+        if total is not None:
             if result["water"] is not None and result["sewer"] is None:
                 derived = round(total - result["water"], 2)
                 if derived > 0:
                     result["sewer"] = derived
+                    if fired is not None:
+                        fired["sewer"] = rule
             elif result["sewer"] is not None and result["water"] is None:
                 derived = round(total - result["sewer"], 2)
                 if derived > 0:
                     result["water"] = derived
+                    if fired is not None:
+                        fired["water"] = rule
 
     return result
 
 
-OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "water_110_tudor.json")
-
-
-def main():
-    all_files = sorted([f for f in os.listdir(BASE) if "Statement" in f and f.endswith(".pdf")])
-
-    # Load existing data and skip already-processed filenames
-    existing = []
-    if os.path.exists(OUTPUT):
-        with open(OUTPUT) as fp:
-            existing = json.load(fp)
-    seen = {r["filename"] for r in existing}
-
-    new_files = [f for f in all_files if f not in seen]
-    if not new_files:
-        print("No new statements found.")
-        return
-
-    new_results = []
-    errors = []
-
-    for f in new_files:
-        filepath = os.path.join(BASE, f)
-        try:
-            text = extract_text(filepath)
-
-            if text is None:
-                errors.append(f"  {f}: could not read")
-                continue
-
-            data = parse_statement(text, f)
-
-            date_match = re.match(r'(\d{4}-\d{2}-\d{2})', f)
-            if date_match:
-                data["statement_date"] = date_match.group(1)
-
-            if data["cf"] is None:
-                errors.append(f"  {f}: no consumption (CF) found")
-            if data["water"] is None:
-                errors.append(f"  {f}: no water charge found")
-            if data["sewer"] is None:
-                errors.append(f"  {f}: no sewer charge found")
-
-            new_results.append(data)
-        except Exception as e:
-            errors.append(f"  {f}: ERROR {e}")
-
-    if errors:
-        print("WARNINGS:")
-        for e in errors:
-            print(e)
-        print()
-
-    results = existing + new_results
-    print(f"New statements processed: {len(new_results)}")
-    print(f"Total statements: {len(results)}")
-    print(f"With CF data: {sum(1 for r in results if r['cf'] is not None)}")
-    print(f"With water data: {sum(1 for r in results if r['water'] is not None)}")
-    print(f"With sewer data: {sum(1 for r in results if r['sewer'] is not None)}")
-
-    with open(OUTPUT, "w") as fp:
-        json.dump(results, fp, indent=2)
-    print(f"\nData written to {OUTPUT}")
+PROVIDER = register(Provider(
+    name="water_110_tudor",
+    title="110 Tudor St — Water & Sewer (BWSC)",
+    property="110_tudor_st",
+    utility="water",
+    source_dir="property_110_tudor_st/service_providers/boston_water_sewer",
+    output="water_110_tudor.json",
+    parse_statement=parse_statement,
+    rules={"period": PERIOD_RULES, "cf": CF_RULES, "water": WATER_RULES + TOTAL_RULES,
+           "sewer": SEWER_RULES + TOTAL_RULES},
+    word_rules=WORD_RULES,
+    layouts=LAYOUTS,
+    fields={"cf": "CF", "water": "water", "sewer": "sewer"},
+    required={"cf": "consumption (CF)", "water": "water charge", "sewer": "sewer charge"},
+    record=WaterRecord,
+    summary=Summary("cf", ("water", "sewer"), "Cf"),
+))
 
 
 if __name__ == "__main__":
-    main()
+    main([PROVIDER], __doc__)
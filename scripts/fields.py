@@ -0,0 +1,209 @@
+"""Declarative field extraction for parse_statement.
+
+Each field (kwh, supply, delivery, period, ...) is an ordered list of Rules
+that are compiled once at import. A rule only runs if its literal `anchor`
+occurs in the text. When the pattern begins with the anchor, every match
+starts at an occurrence of it, so the search starts at the first one; a
+pattern with anything before its anchor is searched from the start of the
+text. Either way a rule finds the same leftmost match the bare regex would,
+and patterns are compiled as written (their `.*?` gaps are not bounded).
+
+A provider can also describe its historical Layouts: a few literal markers
+that identify the format and the rules that format's fields come from. A
+statement routed to a layout runs that layout's rules for each field first,
+so a 2025 bill doesn't pay for misses on rules written for 2009 bills; the
+rest of the chain (in chain order, without retrying those) only runs if they
+miss. That puts a layout's rules ahead of earlier chain rules, so a
+statement on which both match now takes the layout's value.
+
+Dates go through DateFormat, which settles on the format a rule's layout
+uses and memoizes every string it has parsed.
+"""
+
+import re
+import time
+from datetime import datetime
+
+import profiling
+
+MAX_MEMO = 65536
+
+
+class Rule:
+    def __init__(self, name, pattern, convert, anchor=None, flags=0, findall=False):
+        self.name = name
+        self.regex = re.compile(pattern, flags)
+        self.convert = convert
+        self.anchor = anchor
+        # A match can only start at the anchor if the pattern starts with it
+        self.from_anchor = anchor is not None and pattern.startswith(anchor)
+        self.findall = findall
+
+    def apply(self, text):
+        """Return the converted value for this rule, or None if it doesn't match."""
+        pos = 0
+        if self.anchor is not None:
+            idx = text.find(self.anchor)
+            if idx < 0:
+                return None
+            if self.from_anchor:
+                pos = idx
+        if self.findall:
+            found = self.regex.findall(text, pos)
+            if not found:
+                return None
+            arg = found
+        else:
+            arg = self.regex.search(text, pos)
+            if arg is None:
+                return None
+        try:
+            return self.convert(arg)
+        except ValueError:
+            return None
+
+
+class Layout:
+    """One statement format: markers that must all occur, and its rule names per field, tried first."""
+
+    def __init__(self, name, markers, rules):
+        self.name = name
+        self.markers = markers
+        self.rules = rules
+        self._resolved = {}
+
+    def matches(self, text):
+        return all(marker in text for marker in self.markers)
+
+    def rules_for(self, key, rules):
+        """Split a field's chain into (this layout's rules, in its order; the rest, in chain order)."""
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            by_name = {rule.name: rule for rule in rules}
+            names = self.rules.get(key, ())
+            resolved = self._resolved[key] = ([by_name[name] for name in names],
+                                              [rule for rule in rules if rule.name not in names])
+        return resolved
+
+
+def classify(layouts, text):
+    """Return the first layout whose markers all occur in `text`, or None."""
+    for layout in layouts:
+        if layout.matches(text):
+            return layout
+    return None
+
+
+def first_match(rules, text, skip_falsy=False):
+    """Run rules in order and return (value, rule name) for the first that matches.
+
+    With `skip_falsy`, a zero value doesn't end the chain (matching the old
+    `if not result[...]` fallbacks); it is kept only if no later rule matches.
+    """
+    fallback = (None, None)
+    timed = profiling.enabled()
+    for rule in rules:
+        if timed:
+            t = time.perf_counter()
+            value = rule.apply(text)
+            profiling.add_rule(rule.name, time.perf_counter() - t)
+        else:
+            value = rule.apply(text)
+        if value is None:
+            continue
+        if skip_falsy and not value:
+            fallback = (value, rule.name)
+            continue
+        return value, rule.name
+    return fallback
+
+
+def fill(result, field, rules, text, fired=None, skip_falsy=False, layout=None):
+    """Set `result[field]` from the first matching rule and note which rule fired.
+
+    `field` may be a tuple of keys for rules that return a tuple of values.
+    With a `layout`, its rules for the field run first and the rest of the
+    chain only if they miss.
+    """
+    key = field if isinstance(field, str) else field[0].split("_")[0]
+    with profiling.stage("field:" + key):
+        own, rest = layout.rules_for(key, rules) if layout is not None else (rules, ())
+        value, rule = first_match(own, text, skip_falsy)
+        if rest and (value is None or (skip_falsy and not value)):
+            found = first_match(rest, text, skip_falsy)
+            # A falsy value from the layout's rules still beats no match at all
+            if found[0] is not None:
+                value, rule = found
+    if value is None:
+        return
+    if isinstance(field, tuple):
+        result.update(zip(field, value))
+    else:
+        result[field] = value
+    if fired is not None:
+        fired[key] = rule
+
+
+def to_int(m):
+    return int(m.group(1).replace(",", ""))
+
+
+def to_amount(m):
+    return float(m.group(1).replace(",", "").replace(" ", ""))
+
+
+class DateFormat:
+    """Turns dates written in any of `formats` into ISO strings.
+
+    The format that parsed the last date is tried first, so a rule that
+    always sees one layout settles on its format after the first statement,
+    and every string is parsed once: repeats (the same meter-read date on
+    consecutive bills, a re-run over the whole history) are a dict lookup.
+    """
+
+    def __init__(self, *formats):
+        self.formats = list(formats)
+        self._memo = {}
+
+    def __call__(self, value):
+        iso = self._memo.get(value)
+        if iso is None:
+            if len(self._memo) >= MAX_MEMO:
+                self._memo.clear()
+            iso = self._memo[value] = self._parse(value)
+        return iso
+
+    def _parse(self, value):
+        for i, fmt in enumerate(self.formats):
+            try:
+                iso = datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+            if i:
+                self.formats.insert(0, self.formats.pop(i))
+            return iso
+        raise ValueError(f"date {value!r} doesn't match {', '.join(self.formats)}")
+
+
+_date_formats = {}
+
+
+def date_format(fmt):
+    """Return the shared DateFormat for a single format."""
+    parser = _date_formats.get(fmt)
+    if parser is None:
+        parser = _date_formats[fmt] = DateFormat(fmt)
+    return parser
+
+
+def date_pair(*formats):
+    """Converter for a match whose first two groups are the period start and end."""
+    parse = DateFormat(*formats)
+
+    def convert(m):
+        return (parse(m.group(1).strip()), parse(m.group(2).strip()))
+    return convert
+
+
+def normalize_date(value, fmt):
+    return date_format(fmt)(value)
@@ -0,0 +1,230 @@
+"""Where statement PDFs are read from.
+
+The pipeline's --business-dir can be a folder (the albert-business checkout),
+a .zip or .tar(.gz) archive of it, or s3://bucket/prefix on any
+S3-compatible store (boto3 picks up credentials and AWS_ENDPOINT_URL from the
+environment, so a local MinIO mirror works too). Every source lists a
+provider's folder, all at once or lazily with `scan`, and returns statement
+bytes; the bytes go straight to PyMuPDF and the text cache without touching
+a temporary file.
+
+`fetch_and_process` reads statements with bounded concurrency on threads
+while the pipeline's workers extract the ones already fetched, so slow
+storage and PDF parsing overlap. With a timeout, each statement runs in a
+worker process that is killed if it takes longer (a malformed PDF can hang
+PyMuPDF in C code, where nothing else can interrupt it); the statement
+becomes an ERROR warning and the run carries on with a fresh pool. An
+interrupted run (Ctrl-C, SIGINT) kills its worker processes rather than
+waiting for the statements they are on.
+"""
+
+import asyncio
+import os
+import posixpath
+import tarfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import boto3
+except ImportError:  # S3 sources are optional
+    boto3 = None
+
+PREFETCH = 8
+# Times a statement is resubmitted after its pool was killed under it
+RETRIES = 2
+
+
+class DirectorySource:
+    def __init__(self, root):
+        self.root = root
+
+    def list(self, subdir):
+        return os.listdir(os.path.join(self.root, subdir))
+
+    def scan(self, subdir):
+        """Like list, as names are read from the folder rather than all at once."""
+        entries = os.scandir(os.path.join(self.root, subdir))
+        return (entry.name for entry in entries)
+
+    def read(self, subdir, name):
+        with open(os.path.join(self.root, subdir, name), "rb") as fp:
+            return fp.read()
+
+
+class ArchiveSource:
+    """A zip or tar archive of the business folder, optionally wrapped in one top-level directory."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if zipfile.is_zipfile(path):
+            self._archive = zipfile.ZipFile(path)
+            members = {i.filename: i for i in self._archive.infolist() if not i.is_dir()}
+            self._open = self._archive.open
+        else:
+            self._archive = tarfile.open(path)
+            members = {m.name: m for m in self._archive.getmembers() if m.isfile()}
+            self._open = self._archive.extractfile
+        tops = {name.split("/", 1)[0] for name in members}
+        strip = len(tops) == 1 and all("/" in name for name in members)
+        self._members = {}
+        for name, member in members.items():
+            rel = name.split("/", 1)[1] if strip else name
+            self._members.setdefault(posixpath.dirname(rel), {})[posixpath.basename(rel)] = member
+
+    def list(self, subdir):
+        return list(self.scan(subdir))
+
+    def scan(self, subdir):
+        return iter(self._members.get(subdir.strip("/"), ()))
+
+    def read(self, subdir, name):
+        member = self._members[subdir.strip("/")][name]
+        # tarfile shares one file position between readers
+        with self._lock, self._open(member) as fp:
+            return fp.read()
+
+
+class S3Source:
+    def __init__(self, url):
+        if boto3 is None:
+            raise RuntimeError("reading statements from S3 needs boto3 (pip install boto3)")
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client = boto3.client("s3")
+
+    def _key(self, subdir, name=""):
+        return posixpath.join(self.prefix, subdir.strip("/"), name)
+
+    def list(self, subdir):
+        return list(self.scan(subdir))
+
+    def scan(self, subdir):
+        """Like list, a page of the listing at a time."""
+        prefix = self._key(subdir)
+        for page in self._client.get_paginator("list_objects_v2").paginate(
+                Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            yield from (obj["Key"][len(prefix):] for obj in page.get("Contents", ()))
+
+    def read(self, subdir, name):
+        return self._client.get_object(Bucket=self.bucket, Key=self._key(subdir, name))["Body"].read()
+
+
+def open_source(location):
+    if location.startswith("s3://"):
+        return S3Source(location)
+    if os.path.isfile(location):
+        return ArchiveSource(location)
+    return DirectorySource(location)
+
+
+def fetch_and_process(source, tasks, run_one, jobs=1, prefetch=PREFETCH, on_result=None, timeout=None):
+    """Read each task's statement from `source` and run `run_one(task, data)` on it.
+
+    A task is (provider, subdir, filename, ...) and `tasks` may be a lazy
+    iterator. At most `prefetch` reads are in flight and at most
+    `prefetch + jobs` statements are held in memory. A failed read becomes an
+    ERROR warning like any other failure.
+
+    Results are returned as a list in task order, or, with `on_result`, passed
+    to `on_result(task, result)` in task order as soon as they are ready and
+    not kept.
+
+    With a `timeout` in seconds, a statement still running after that long
+    becomes an ERROR warning and its worker is killed.
+    """
+    results = []
+    if on_result is None:
+        def on_result(task, result):
+            results.append(result)
+    asyncio.run(_fetch_and_process(source, tasks, run_one, jobs, prefetch, on_result, timeout))
+    return results
+
+
+class _Workers:
+    """The executor statements run on, replaced by a fresh pool when a hung one is killed."""
+
+    def __init__(self, jobs, timeout):
+        self.jobs = jobs
+        # Only processes can be killed, so a timeout needs a process even for one job
+        self.processes = jobs > 1 or timeout is not None
+        self.executor = self._new()
+
+    def _new(self):
+        if self.processes:
+            return ProcessPoolExecutor(max_workers=self.jobs)
+        return ThreadPoolExecutor(max_workers=1)
+
+    @staticmethod
+    def _terminate(executor):
+        # ProcessPoolExecutor can't cancel a running call; terminate its workers instead
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def kill(self, executor):
+        """Kill `executor`'s processes (and whatever else they were running) and start a new pool."""
+        if executor is not self.executor:
+            return  # already replaced
+        self._terminate(executor)
+        self.executor = self._new()
+
+    def shutdown(self, wait=True):
+        """Shut the pool down, or without `wait` kill its processes instead of waiting for them."""
+        if wait:
+            self.executor.shutdown()
+        else:
+            self._terminate(self.executor)
+
+
+async def _fetch_and_process(source, tasks, run_one, jobs, prefetch, on_result, timeout=None):
+    loop = asyncio.get_running_loop()
+    reads = asyncio.Semaphore(prefetch)
+    workers = _Workers(jobs, timeout)
+    # Submit no more than the workers can start, so the timeout only counts running time
+    running = asyncio.Semaphore(jobs)
+
+    async def run(task, data):
+        filename = task[2]
+        for _ in range(RETRIES + 1):
+            async with running:
+                executor = workers.executor
+                try:
+                    return await asyncio.wait_for(loop.run_in_executor(executor, run_one, task, data), timeout)
+                except asyncio.TimeoutError:
+                    workers.kill(executor)
+                    return None, [f"  {filename}: ERROR timed out after {timeout:g}s"], None
+                except BrokenProcessPool:
+                    # Killed for another statement's timeout, or a worker crashed: try again on the new pool
+                    workers.kill(executor)
+        return None, [f"  {filename}: ERROR worker process died"], None
+
+    async def one(task):
+        _, subdir, filename = task[:3]
+        try:
+            async with reads:
+                data = await asyncio.to_thread(source.read, subdir, filename)
+        except Exception as e:
+            return None, [f"  {filename}: ERROR {e}"], None
+        return await run(task, data)
+
+    try:
+        window = deque()
+        for task in tasks:
+            window.append((task, asyncio.ensure_future(one(task))))
+            if len(window) >= prefetch + jobs:
+                task, future = window.popleft()
+                on_result(task, await future)
+        while window:
+            task, future = window.popleft()
+            on_result(task, await future)
+    except BaseException:
+        # Interrupted (KeyboardInterrupt arrives as a cancellation) or failed
+        workers.shutdown(wait=False)
+        raise
+    workers.shutdown()
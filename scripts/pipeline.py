@@ -0,0 +1,474 @@
+"""Shared extraction run for every registered provider.
+
+Statements can be processed serially or farmed out to a process pool. Either
+way, results and warnings come back in the order of the input filenames, so a
+parallel run writes exactly the same JSON as a serial one. Several providers
+can be refreshed in one run, sharing the worker pool and the text cache.
+
+Completed records are checkpointed to each provider's record log every few
+seconds rather than once at the end, and statements already in the log are
+skipped, so a run that is killed or crashes resumes where it stopped: it
+leaves its in-progress marker behind (see record_store), and the next run
+extracts only the rest and finishes the interrupted one (compacts,
+writes artifacts, syncs the database and checks the recovered records).
+Each statement also gets a --timeout, so one that hangs PyMuPDF becomes an
+ERROR warning instead of stalling the batch.
+"""
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import anomalies
+import ingest
+import profiling
+from calendar_months import write_calendar
+from profiling import RunProfile, stage
+from providers import BUSINESS_DIR
+from record_db import RecordDB
+from record_store import RecordStore
+from fields import classify, fill, first_match
+from statements import extract_text, extract_text_lazily, extract_words
+from summaries import write_summary
+from text_cache import TextCache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+# Seconds between checkpoints of completed records to the record logs
+CHECKPOINT_SECONDS = 10
+TIMEOUT = 120
+
+
+def add_pipeline_arguments(parser):
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="number of worker processes (0 = one per CPU)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't read or write the extracted-text cache")
+    parser.add_argument("--business-dir", default=BUSINESS_DIR,
+                        help="root of the albert-business repo: a folder, a .zip/.tar archive or s3://bucket/prefix "
+                             "(default: $ALBERT_BUSINESS_DIR)")
+    parser.add_argument("--prefetch", type=int, default=ingest.PREFETCH,
+                        help="statements read ahead of extraction (default: %(default)s)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where record JSON files are written")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help="seconds before a statement is given up on and its worker killed "
+                             "(0 = no limit, default: %(default)s)")
+    parser.add_argument("--stream", action="store_true",
+                        help="write each record as soon as it is parsed and hold one provider at a time in memory")
+    parser.add_argument("--lazy", action="store_true",
+                        help="extract pages only until every field is found instead of reading whole "
+                             "statements")
+    parser.add_argument("--words", action="store_true",
+                        help="read fields next to their labels from word positions, using the text rules only for "
+                             "fields that aren't found that way")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every stage and rule and print the slowest statements and rules")
+    parser.add_argument("--profile-trace", metavar="PATH",
+                        help="also write the per-file timings as JSON to PATH (implies --profile)")
+
+
+def cache_from_args(args):
+    return None if args.no_cache else TextCache()
+
+
+def read_words(provider, index, filename):
+    """Fill a record from the provider's word rules on a WordIndex; return (record, fired)."""
+    record = provider.record(filename)
+    fired = {}
+    if provider.layouts:
+        layout = classify(provider.layouts, index.text())
+        fired["layout"] = layout.name if layout else None
+    with stage("parse"):
+        for key, rules in provider.word_rules.items():
+            fill(record, ("period_start", "period_end") if key == "period" else key, rules, index, fired)
+    return record, fired
+
+
+def _fields_found(provider):
+    """A `done(text)` for extract_text_lazily: true once the rules of every field the provider records match.
+
+    That is the period and every one of `provider.fields`, not only the
+    required ones: a charge on a later page than the usage must still be read.
+    Only the rules of fields still missing are tried on each page; the whole
+    statement is parsed once, after the last page needed is read.
+    """
+    missing = {field: provider.rules.get(field) for field in ("period", *provider.fields)}
+
+    def done(text):
+        for field, rules in list(missing.items()):
+            # A field without rules can't be checked, so every page is read
+            if rules is not None and first_match(rules, text)[0] is not None:
+                del missing[field]
+        return not missing
+    return done
+
+
+def process_statement(provider, filepath, filename, cache=None, lazy=False, data=None, words=False):
+    """Extract and parse one statement, returning (record, warnings).
+
+    The record's "layout" names the format parse_statement routed it to, and
+    "rules" maps each field to the name of the rule that found it. If `data`
+    is given, the statement is read from those bytes, not from `filepath`.
+    With `lazy`, pages are read only until every field is found, and the rest
+    are skipped.
+
+    With `words`, fields are first read from the statement's word boxes by the
+    provider's word rules. The text is only extracted (from the same open
+    document) and parsed if some field is still missing, and then only fills
+    the fields the word rules missed.
+    """
+    warnings = []
+    parsed = {}
+    found = None
+    done = _fields_found(provider) if lazy else None
+    if words and provider.word_rules:
+        def needs_text(index):
+            nonlocal found
+            found = read_words(provider, index, filename)
+            return any(value is None for value in found[0].values())
+
+        index, text = extract_words(filepath, provider.is_garbled, provider.passwords, data, needs_text, cache,
+                                    done)
+        if index is not None and text is None:
+            parsed["data"], parsed["rules"] = found
+    elif lazy:
+        text = extract_text_lazily(filepath, done, provider.is_garbled, provider.passwords, cache, data)
+    else:
+        text = extract_text(filepath, provider.is_garbled, provider.passwords, cache, data)
+
+    if "data" not in parsed:
+        if text is None:
+            warnings.append(f"  {filename}: {provider.unreadable}")
+            return None, warnings
+        fired = {}
+        with stage("parse"):
+            parsed["data"] = provider.parse_statement(text, filename, fired)
+        parsed["rules"] = fired
+        if found is not None:
+            # Values read from word boxes win; the text rules fill in the rest
+            record, fired = found
+            parsed["data"].update((key, value) for key, value in record.items() if value is not None)
+            parsed["rules"].update(fired)
+    data = parsed["data"]
+    # Which layout the statement was routed to and which rule produced each
+    # field, for `extract.py --rule-stats`
+    rules = parsed["rules"]
+    if "layout" in rules:
+        data["layout"] = rules.pop("layout")
+    data["rules"] = rules
+
+    # Use filename date as fallback for period
+    date_match = re.match(r'(\d{4}-\d{2}-\d{2})', filename)
+    if date_match:
+        data["statement_date"] = date_match.group(1)
+
+    for field, label in provider.required.items():
+        if data[field] is None:
+            warnings.append(f"  {filename}: no {label} found")
+
+    return data, warnings
+
+
+def _run_one(task, data=None):
+    """Run one (provider, base, filename, cache, profile, lazy, words) task, optionally on prefetched bytes.
+
+    Returns (record, warnings, timings); exceptions become warnings and
+    timings is None unless the task asked to be profiled.
+    """
+    provider, base, filename, cache, profile, lazy, words = task
+    if profile:
+        profiling.start()
+    t = time.perf_counter()
+    try:
+        record, warnings = process_statement(provider, os.path.join(base, filename), filename, cache, lazy, data,
+                                             words)
+    except Exception as e:
+        record, warnings = None, [f"  {filename}: ERROR {e}"]
+    if not profile:
+        return record, warnings, None
+    timings = profiling.stop()
+    timings["total"] = time.perf_counter() - t
+    return record, warnings, timings
+
+
+def process_files(tasks, jobs=1, timeout=None):
+    """Run tasks serially or on a process pool, returning outcomes in task order.
+
+    With a `timeout`, each statement runs in a worker process that is killed
+    if it takes longer, as in fetch_and_process_files.
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if timeout:
+        # Task bases are folder paths, so the files are read relative to nothing
+        return fetch_and_process_files(ingest.DirectorySource(""), tasks, jobs, timeout=timeout)
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            return list(pool.map(_run_one, tasks))
+    return [_run_one(task) for task in tasks]
+
+
+def fetch_and_process_files(source, tasks, jobs=1, prefetch=ingest.PREFETCH, on_result=None, timeout=None):
+    """Like process_files, but read each statement from `source` while earlier ones are extracted."""
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    return ingest.fetch_and_process(source, tasks, _run_one, jobs, prefetch, on_result, timeout or None)
+
+
+def is_statement(filename):
+    return "Statement" in filename and filename.endswith(".pdf")
+
+
+def list_statements(base):
+    return sorted([f for f in os.listdir(base) if is_statement(f)])
+
+
+def source_statements(source, provider, lazy=False):
+    """The provider's statement filenames in `source`, or None (with a warning) if its folder is missing.
+
+    With `lazy`, the names are a generator over the folder as it is listed.
+    """
+    try:
+        names = (f for f in source.scan(provider.source_dir) if is_statement(f))
+    except FileNotFoundError:
+        print(f"WARNING: no folder {provider.source_dir} for {provider.name}, skipped")
+        return None
+    return names if lazy else list(names)
+
+
+def print_flags(flags):
+    for filename, problem in flags:
+        print(f"  {filename}: {problem}")
+
+
+def report(provider, path, records, new_count, errors, flags=()):
+    if errors:
+        print("WARNINGS:")
+        for e in errors:
+            print(e)
+        print()
+    if flags:
+        print("SUSPICIOUS VALUES:")
+        print_flags(flags)
+        print()
+
+    counts = dict.fromkeys(provider.fields, 0)
+    for r in records:
+        for field in counts:
+            if r[field] is not None:
+                counts[field] += 1
+    print(f"New statements processed: {new_count}")
+    print(f"Total statements: {len(records)}")
+    for field, label in provider.fields.items():
+        print(f"With {label} data: {counts[field]}")
+    print(f"\nData written to {path}")
+
+
+def run(providers, args):
+    """Extract new statements for each provider and append them to its record store.
+
+    Records are appended to the stores as they complete, at most
+    CHECKPOINT_SECONDS apart, so an interrupted run loses little work.
+    """
+    if args.stream:
+        run_streaming(providers, args)
+        return
+    cache = cache_from_args(args)
+    profile = RunProfile() if args.profile or args.profile_trace else None
+    source = ingest.open_source(args.business_dir)
+    plans = []
+    tasks = []
+    for provider in providers:
+        statements = source_statements(source, provider)
+        if statements is None:
+            continue
+        store = RecordStore(args.data_dir, provider.output, provider.record)
+        recovered = store.start_run()
+
+        # Skip already-processed filenames
+        seen = store.filenames()
+        new_files = [f for f in sorted(statements) if f not in seen]
+        plans.append((provider, store, len(new_files), recovered))
+        tasks.extend((provider, provider.source_dir, f, cache, profile is not None, args.lazy, args.words)
+                     for f in new_files)
+
+    stores = {provider.name: store for provider, store, *_ in plans}
+    outcomes = []
+    pending = {}
+    last_checkpoint = time.monotonic()
+
+    def checkpoint():
+        for name, records in pending.items():
+            stores[name].append(records)
+        pending.clear()
+
+    def on_result(task, outcome):
+        nonlocal last_checkpoint
+        outcomes.append(outcome)
+        if outcome[0] is not None:
+            pending.setdefault(task[0].name, []).append(outcome[0])
+        if time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+            checkpoint()
+            last_checkpoint = time.monotonic()
+
+    try:
+        fetch_and_process_files(source, tasks, args.jobs, args.prefetch, on_result, args.timeout)
+    finally:
+        # Keep what was finished even if the run is interrupted
+        checkpoint()
+    if cache is not None:
+        cache.prune()
+    if profile is not None:
+        for (provider, _, filename, *_), (_, _, timings) in zip(tasks, outcomes):
+            profile.add_file(provider.name, filename, timings)
+
+    for provider, store, count, recovered in plans:
+        if len(providers) > 1:
+            print(f"== {provider.title}")
+        file_outcomes, outcomes = outcomes[:count], outcomes[count:]
+        if not count and not recovered:
+            print("No new statements found.")
+            store.end_run()
+            continue
+        if recovered:
+            print(f"Resuming an interrupted run: {len(recovered)} statement(s) were already extracted")
+        if profile is None:
+            save_outcomes(provider, store, file_outcomes, recovered, logged=True)
+        else:
+            with profile.stage("write"):
+                save_outcomes(provider, store, file_outcomes, recovered, logged=True)
+
+    if profile is not None:
+        profile.print_summary()
+        if args.profile_trace:
+            profile.dump(args.profile_trace)
+            print(f"\nProfile trace written to {args.profile_trace}")
+
+
+def run_streaming(providers, args):
+    """Like run, but without holding the archive's records or filenames in memory.
+
+    Statements are listed lazily, each record is appended to the log the
+    moment it is parsed and warnings are printed as they come, so nothing
+    accumulates across files or providers. Seen filenames are a FilenameIndex.
+    Compaction holds only the new records, and the artifacts, database and
+    report are built in passes over the store rather than from a list of
+    every record. Memory still grows with the archive in places, just not
+    by whole records: the index (8 bytes a statement), the summary's arrays
+    (a few numbers per record) and the calendar's NumPy work arrays (a few
+    per billed day). Rebuilding the anomaly state, when the saved one no
+    longer matches, still sorts every record in memory.
+    """
+    cache = cache_from_args(args)
+    profile = RunProfile() if args.profile or args.profile_trace else None
+    source = ingest.open_source(args.business_dir)
+    for provider in providers:
+        if len(providers) > 1:
+            print(f"== {provider.title}")
+        statements = source_statements(source, provider, lazy=True)
+        if statements is None:
+            continue
+        store = RecordStore(args.data_dir, provider.output, provider.record)
+        recovered = len(store.start_run())
+        seen = store.filename_index()
+        if recovered:
+            print(f"Resuming an interrupted run: {recovered} statement(s) were already extracted")
+        attempted = 0
+        tasks = ((provider, provider.source_dir, f, cache, profile is not None, args.lazy, args.words)
+                 for f in statements if f not in seen)
+
+        with store.writer() as write:
+            def on_result(task, outcome):
+                nonlocal attempted
+                attempted += 1
+                record, warnings, timings = outcome
+                for w in warnings:
+                    print(w)
+                if record is not None:
+                    write(record)
+                if profile is not None:
+                    profile.add_file(provider.name, task[2], timings)
+
+            fetch_and_process_files(source, tasks, args.jobs, args.prefetch, on_result, args.timeout)
+        del seen
+
+        if not attempted and not recovered:
+            print("No new statements found.")
+            store.end_run()
+            continue
+        new_results = store.compact()
+        write_artifacts(provider, store.json_path, store)
+        with RecordDB(args.data_dir) as db:
+            db.sync_bills(provider, new_results, store)
+        flags = anomalies.check_new(provider, new_results, store)
+        report(provider, store.json_path, store, len(new_results), (), flags)
+
+    if cache is not None:
+        cache.prune()
+    if profile is not None:
+        profile.print_summary()
+        if args.profile_trace:
+            profile.dump(args.profile_trace)
+            print(f"\nProfile trace written to {args.profile_trace}")
+
+
+def write_artifacts(provider, json_path, records):
+    """Write the chart summary and calendar-month totals derived from a compacted record file.
+
+    `records` may be the RecordStore itself; each artifact reads it in one pass.
+    """
+    write_summary(provider, json_path, records)
+    write_calendar(provider, json_path, records)
+
+
+def save_outcomes(provider, store, file_outcomes, recovered=(), logged=False):
+    """Append the parsed records to the provider's store, compact it, refresh its artifacts and report.
+
+    `recovered` are records an interrupted run left in the log; they are
+    reported as new along with the parsed ones. With `logged`, the parsed
+    records were already checkpointed to the log and aren't appended again.
+    """
+    parsed = [record for record, _, _ in file_outcomes if record is not None]
+    new_results = [*recovered, *parsed]
+    errors = [w for _, file_warnings, _ in file_outcomes for w in file_warnings]
+    if not logged:
+        store.append(parsed)
+    store.compact()
+    write_artifacts(provider, store.json_path, store)
+    with RecordDB(os.path.dirname(store.json_path)) as db:
+        db.sync_bills(provider, new_results, store)
+    flags = anomalies.check_new(provider, new_results, store)
+    report(provider, store.json_path, store, len(new_results), errors, flags)
+
+
+def compact(providers, args):
+    """Rebuild each provider's JSON array, derived artifacts and database rows from its record log."""
+    with RecordDB(args.data_dir) as db:
+        for provider in providers:
+            store = RecordStore(args.data_dir, provider.output, provider.record)
+            store.compact(rewrite=True)
+            write_artifacts(provider, store.json_path, store)
+            db.replace_bills(provider, store)
+            print(f"{provider.name}: {len(store)} records written to {store.json_path}")
+        db.replace_vehicles(args.data_dir)
+        print(f"Records database written to {db.path}")
+
+
+def check(providers, args):
+    """Re-check every provider's records for suspicious values and print what is flagged."""
+    for provider in providers:
+        if provider.summary is None:
+            continue
+        store = RecordStore(args.data_dir, provider.output, provider.record)
+        store.compact()
+        _, flags = anomalies.scan(provider, store)
+        print(f"{provider.name}: {len(flags)} suspicious value(s) in {len(store)} records")
+        print_flags(flags)
+
+
+def main(providers, description=None):
+    parser = argparse.ArgumentParser(description=description)
+    add_pipeline_arguments(parser)
+    args = parser.parse_args()
+    run(providers, args)
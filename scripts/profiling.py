@@ -0,0 +1,120 @@
+"""Per-file, per-stage timers for the extraction pipeline.
+
+Profiling is off unless a worker calls `start()` for the file it is about to
+process. While a file is being profiled, `stage(name)` blocks and
+`add_rule(name, seconds)` accumulate into that file's timings, which `stop()`
+returns so they can travel back from a worker process with the record. With
+profiling off, `stage()` is a no-op.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+_current = None
+
+
+def start():
+    global _current
+    _current = {"stages": {}, "rules": {}}
+
+
+def stop():
+    """Finish the current file and return its timings (seconds)."""
+    global _current
+    timings, _current = _current, None
+    return timings
+
+
+def _add(bucket, name, seconds):
+    calls, total, longest = bucket.get(name, (0, 0.0, 0.0))
+    bucket[name] = (calls + 1, total + seconds, max(longest, seconds))
+
+
+@contextmanager
+def stage(name):
+    if _current is None:
+        yield
+        return
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(_current["stages"], name, time.perf_counter() - t)
+
+
+def enabled():
+    return _current is not None
+
+
+def add_rule(name, seconds):
+    if _current is not None:
+        _add(_current["rules"], name, seconds)
+
+
+class RunProfile:
+    """Collects file timings from a run and prints or dumps the summary."""
+
+    def __init__(self):
+        self.files = []
+        self.run_stages = {}
+
+    def add_file(self, provider, filename, timings):
+        if timings is not None:
+            self.files.append({"provider": provider, "filename": filename, **timings})
+
+    @contextmanager
+    def stage(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            _add(self.run_stages, name, time.perf_counter() - t)
+
+    def _stage_totals(self):
+        totals = {}
+        for f in self.files:
+            for name, (calls, total, longest) in f["stages"].items():
+                c, t, m = totals.get(name, (0, 0.0, 0.0))
+                totals[name] = (c + calls, t + total, max(m, longest))
+        for name, (calls, total, longest) in self.run_stages.items():
+            totals[name] = (calls, total, longest)
+        return totals
+
+    def _rule_totals(self):
+        totals = {}
+        for f in self.files:
+            for name, (calls, total, longest) in f["rules"].items():
+                key = (f["provider"], name)
+                c, t, m = totals.get(key, (0, 0.0, 0.0))
+                totals[key] = (c + calls, t + total, max(m, longest))
+        return totals
+
+    def print_summary(self, top=10):
+        print("\nPROFILE")
+        print(f"{'stage':<22}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}")
+        for name, (calls, total, longest) in sorted(self._stage_totals().items(), key=lambda kv: -kv[1][1]):
+            print(f"{name:<22}{calls:>8}{total * 1000:>12.1f}{total / calls * 1000:>10.2f}{longest * 1000:>10.2f}")
+
+        print(f"\nSlowest statements (top {top})")
+        for f in sorted(self.files, key=lambda f: -f["total"])[:top]:
+            slowest = max(f["stages"].items(), key=lambda kv: kv[1][1], default=("-", (0, 0.0, 0.0)))
+            print(f"{f['total'] * 1000:>9.1f} ms  {f['provider']:<20} {f['filename']}  (most in {slowest[0]})")
+
+        print(f"\nSlowest rules (top {top})")
+        rules = sorted(self._rule_totals().items(), key=lambda kv: -kv[1][1])[:top]
+        for (provider, name), (calls, total, longest) in rules:
+            print(f"{total * 1000:>9.2f} ms  {provider:<20} {name:<30} calls={calls}  max={longest * 1000:.2f} ms")
+
+    def dump(self, path):
+        def rows(bucket):
+            return {name: {"calls": c, "total": t, "max": m} for name, (c, t, m) in bucket.items()}
+
+        trace = {
+            "run": rows(self.run_stages),
+            "files": [{"provider": f["provider"], "filename": f["filename"], "total": f["total"],
+                       "stages": rows(f["stages"]), "rules": rows(f["rules"])}
+                      for f in sorted(self.files, key=lambda f: -f["total"])],
+        }
+        with open(path, "w") as fp:
+            json.dump(trace, fp, indent=2)
@@ -0,0 +1,92 @@
+"""Registry of statement providers handled by the extraction pipeline.
+
+Each extract_* module describes its provider (where the statements live, how
+to read and parse them, which fields it must find and where the records go)
+and registers it here. `load_providers()` imports every provider module so a
+single `extract.py` run can refresh them all.
+"""
+
+import importlib
+import os
+
+import credentials
+
+# Root of the albert-business repo, where each provider's statements are filed
+BUSINESS_DIR = os.environ.get("ALBERT_BUSINESS_DIR", "/Users/albert/albert_git_repos/albert-business")
+
+PROVIDER_MODULES = [
+    "extract_electric_110tudor",
+    "extract_electric_69hpl",
+    "extract_gas_110tudor",
+    "extract_water_110tudor",
+]
+
+REGISTRY = {}
+
+
+class Provider:
+    """How to find, read and parse one account's statements.
+
+    `fields` maps record keys to the labels used in the run summary, and
+    `required` maps keys to the labels used in "no ... found" warnings.
+    `rules` maps each key parse_statement reports in `fired` to the Rules
+    that can produce it, for the rule-hit report, and `word_rules` maps the
+    same keys to the WordRules `--words` tries first. `layouts` are the
+    Layouts parse_statement classifies by, for records read from word boxes.
+    `passwords` can be overridden with ALBERT_<NAME>_PASSWORDS.
+    `summary` describes the chart summary written next to the records, and
+    `property` and `utility` label the provider's rows in the records database.
+    `record` is the typed record class parse_statement returns and the record
+    store loads.
+    """
+
+    def __init__(self, name, title, source_dir, output, parse_statement, fields, required,
+                 is_garbled=None, passwords=(), unreadable="could not read", summary=None,
+                 property=None, utility=None, rules=None, record=None,
+                 word_rules=None, layouts=()):
+        self.name = name
+        self.title = title
+        self.source_dir = source_dir
+        self.output = output
+        self.parse_statement = parse_statement
+        self.fields = fields
+        self.required = required
+        self.is_garbled = is_garbled
+        self.passwords = credentials.configured(name, passwords)
+        self.unreadable = unreadable
+        self.summary = summary
+        self.property = property
+        self.utility = utility
+        self.rules = rules or {}
+        self.record = record
+        self.word_rules = word_rules or {}
+        self.layouts = layouts
+
+    def base(self, business_dir=BUSINESS_DIR):
+        return os.path.join(business_dir, self.source_dir)
+
+    def __reduce__(self):
+        # Worker processes look the provider up by name rather than unpickling
+        # its rules, whose converters can be closures
+        return _registered, (self.name,)
+
+
+def _registered(name):
+    return load_providers([name])[0]
+
+
+def register(provider):
+    REGISTRY[provider.name] = provider
+    return provider
+
+
+def load_providers(names=None):
+    """Import every provider module and return the requested providers in registry order."""
+    for module in PROVIDER_MODULES:
+        importlib.import_module(module)
+    if not names:
+        return list(REGISTRY.values())
+    unknown = [n for n in names if n not in REGISTRY]
+    if unknown:
+        raise KeyError(f"unknown provider(s): {', '.join(unknown)} (known: {', '.join(REGISTRY)})")
+    return [REGISTRY[n] for n in names]
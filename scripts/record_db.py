@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Consolidated SQLite table of every utility bill and vehicle event.
+
+The per-provider JSON arrays stay the source of truth for the dashboard; this
+database is a derived, queryable copy of all of them in data/records.sqlite.
+Bills from every property and utility share one typed `bills` table (usage
+and charges as REAL, dates as ISO text) indexed on date, property and
+utility, so cross-property questions are a single filtered GROUP BY:
+
+    python scripts/record_db.py "SELECT utility, round(sum(cost), 2) FROM bills
+                                 WHERE date LIKE '2024-%' GROUP BY utility"
+
+The extraction pipeline inserts newly parsed bills after each run and
+resyncs a provider's rows whenever they drift from its record file;
+`extract.py --compact` rebuilds every provider and vehicle from scratch.
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import sys
+
+DB_NAME = "records.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    source TEXT NOT NULL,
+    property TEXT NOT NULL,
+    utility TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    date TEXT NOT NULL,
+    statement_date TEXT NOT NULL,
+    period_start TEXT,
+    period_end TEXT,
+    usage REAL,
+    unit TEXT NOT NULL,
+    supply REAL,
+    delivery REAL,
+    water REAL,
+    sewer REAL,
+    cost REAL,
+    PRIMARY KEY (source, filename)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bills_date ON bills (date);
+CREATE INDEX IF NOT EXISTS bills_property ON bills (property, date);
+CREATE INDEX IF NOT EXISTS bills_utility ON bills (utility, date);
+
+CREATE TABLE IF NOT EXISTS vehicle_events (
+    vehicle TEXT NOT NULL,
+    date TEXT NOT NULL,
+    miles INTEGER,
+    label TEXT,
+    detail TEXT,
+    is_purchase INTEGER NOT NULL,
+    provider TEXT,
+    service TEXT,
+    cost REAL,
+    categories TEXT
+);
+CREATE INDEX IF NOT EXISTS vehicle_events_date ON vehicle_events (vehicle, date);
+"""
+
+BILL_COLUMNS = ("source", "property", "utility", "filename", "date", "statement_date", "period_start",
+                "period_end", "usage", "unit", "supply", "delivery", "water", "sewer", "cost")
+CHARGES = ("supply", "delivery", "water", "sewer")
+EVENT_COLUMNS = ("vehicle", "date", "miles", "label", "detail", "is_purchase", "provider", "service",
+                 "cost", "categories")
+
+
+def _bill_row(provider, record):
+    charges = [record.get(c) for c in CHARGES]
+    known = [c for c in charges if c is not None]
+    usage = provider.summary.usage
+    return (provider.name, provider.property, provider.utility, record["filename"],
+            record.get("period_end") or record["statement_date"], record["statement_date"],
+            record.get("period_start"), record.get("period_end"), record.get(usage), usage,
+            *charges, round(sum(known), 2) if known else None)
+
+
+def _event_row(vehicle, event):
+    return (vehicle, event["date"], event.get("miles"), event.get("label"), event.get("detail"),
+            int(bool(event.get("is_purchase"))), event.get("provider"), event.get("service"),
+            event.get("cost"), json.dumps(event.get("categories", [])))
+
+
+class RecordDB:
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, DB_NAME)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_bills(self, provider, records):
+        """Insert or replace bills for one provider, keyed by filename."""
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO bills VALUES ({', '.join('?' * len(BILL_COLUMNS))})",
+                (_bill_row(provider, r) for r in records))
+
+    def replace_bills(self, provider, records):
+        """Make the provider's rows exactly `records`."""
+        with self.conn:
+            self.conn.execute("DELETE FROM bills WHERE source = ?", (provider.name,))
+        self.add_bills(provider, records)
+
+    def sync_bills(self, provider, new_records, records):
+        """Add `new_records`, resyncing the provider from `records` if its row count has drifted."""
+        self.add_bills(provider, new_records)
+        count, = self.conn.execute("SELECT count(*) FROM bills WHERE source = ?", (provider.name,)).fetchone()
+        if count != len(records):
+            self.replace_bills(provider, records)
+
+    def replace_vehicles(self, data_dir):
+        """Reload every data/vehicle_*.json file into vehicle_events."""
+        rows = []
+        for path in sorted(glob.glob(os.path.join(data_dir, "vehicle_*.json"))):
+            vehicle = os.path.splitext(os.path.basename(path))[0][len("vehicle_"):]
+            with open(path) as fp:
+                rows.extend(_event_row(vehicle, e) for e in json.load(fp)["events"])
+        with self.conn:
+            self.conn.execute("DELETE FROM vehicle_events")
+            self.conn.executemany(
+                f"INSERT INTO vehicle_events VALUES ({', '.join('?' * len(EVENT_COLUMNS))})", rows)
+
+    def query(self, sql, params=()):
+        cursor = self.conn.execute(sql, params)
+        return [d[0] for d in cursor.description or ()], cursor.fetchall()
+
+
+def main():
+    from pipeline import DATA_DIR
+
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    with RecordDB(DATA_DIR) as db:
+        columns, rows = db.query(sys.argv[1])
+    if columns:
+        print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Append-only record store behind each data/<provider>.json file.
+
+New records are appended to data/<provider>.jsonl, one JSON object per line,
+and `compact()` commits them to the sorted JSON array the dashboard reads.
+The log mirrors the array, so only its tail past what was committed has to
+be read: when there is none nothing is written, and when the new filenames
+all sort after the committed ones (dated statements arriving in order) they
+are appended to the array in place. Anything else, such as a statement
+extracted again or an older one found late, rewrites the array whole, to a
+temp file renamed into place so a crash can't truncate the history.
+
+In streaming runs each record is written to the log as soon as it is
+parsed, and the filenames already seen are held as a FilenameIndex. Other
+runs append completed records in periodic checkpoints. A run marks itself
+in progress (data/<provider>.jsonl.run) with `start_run()` and the marker is
+cleared when the log is compacted, so a killed run leaves it behind and the
+next `start_run()` returns the records it logged but never compacted. Log
+records without a marker were never meant to be committed (a run that
+appends and compacts in one go died in between) and are dropped.
+
+The log is a local working file and the committed JSON array stays the
+source of truth. The store remembers the size and mtime of the JSON it last
+seeded the log from or compacted it to, and how far the log mirrored it
+(data/<provider>.jsonl.base); if the JSON has changed since (edited or
+trimmed by hand, pulled from another machine) or the log is missing, the log
+is reseeded from the JSON before it is used, so a deleted record is
+extracted again rather than restored from the log.
+
+Given a record type (see records.py), the store hands out typed records
+instead of dicts; either kind is written as the same JSON object.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# mkstemp creates files as 0600; compacted files get normal permissions
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _encode(value):
+    """json `default` hook for typed records."""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(record):
+    return json.dumps(record, default=_encode)
+
+
+def atomic_write_json(path, data, indent=2):
+    """Write JSON to a temp file in the same directory and rename it over `path`."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        os.chmod(tmp, 0o666 & ~_UMASK)
+        with os.fdopen(fd, "w") as fp:
+            json.dump(data, fp, indent=indent, default=_encode)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _filename_hash(filename):
+    return int.from_bytes(hashlib.blake2b(filename.encode(), digest_size=8).digest(), "little")
+
+
+class FilenameIndex:
+    """Set of filenames kept as a sorted array of 64-bit hashes, 8 bytes per name.
+
+    A hash collision would make an unseen statement look seen; at 64 bits
+    that needs billions of statements to become likely.
+    """
+
+    def __init__(self, filenames=()):
+        hashes = array("Q", (_filename_hash(f) for f in filenames))
+        self._hashes = array("Q", sorted(hashes))
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, filename):
+        h = _filename_hash(filename)
+        i = bisect_left(self._hashes, h)
+        return i < len(self._hashes) and self._hashes[i] == h
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return None
+
+
+def _stat(path):
+    """[size, mtime_ns] of the file at `path`, or None if there is none."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class RecordStore:
+    def __init__(self, data_dir, output, record=None):
+        self.json_path = os.path.join(data_dir, output)
+        self.log_path = os.path.splitext(self.json_path)[0] + ".jsonl"
+        self.base_path = self.log_path + ".base"
+        self.run_path = self.log_path + ".run"
+        self.record = record
+
+    def _base(self):
+        """What the store last seeded the log from or committed to the JSON (see _seed), or None.
+
+        "json" is the JSON file's [size, mtime_ns]; "count" its number of
+        records; "last" its last filename, or None if the array wasn't written
+        by compact() and can't be appended to in place; "log_size" the length
+        of the log it mirrors, the records past it being the tail not yet
+        committed; "pending" the offset an in-place append started at.
+        """
+        try:
+            with open(self.base_path) as fp:
+                base = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            return None
+        return base if isinstance(base, dict) and "log_size" in base else None  # older stores kept a hash
+
+    def _set_base(self, json_stat, count, last, log_size, pending=None):
+        atomic_write_json(self.base_path, {"json": json_stat, "count": count, "last": last,
+                                           "log_size": log_size, "pending": pending}, indent=None)
+
+    def _seed(self, force=False):
+        """Rebuild the log from the JSON array if it is missing or the JSON has changed since; return the base."""
+        base = self._base()
+        if base is not None and base["pending"] is not None:
+            base = self._roll_back(base)
+        log_size = _size(self.log_path)
+        if (not force and base is not None and base["json"] == _stat(self.json_path)
+                and None not in (log_size, base["log_size"]) and log_size >= base["log_size"]):
+            return base
+        records = []
+        if os.path.exists(self.json_path):
+            with open(self.json_path) as fp:
+                records = json.load(fp)
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        self._write_log(records, "w")
+        self._set_base(_stat(self.json_path), len(records), None, _size(self.log_path))
+        return self._base()
+
+    def _roll_back(self, base):
+        """Undo an in-place append to the JSON array that a crash cut short (see _append_json)."""
+        offset = base["pending"]
+        with open(self.json_path, "rb+") as fp:
+            fp.truncate(offset)
+            fp.seek(offset)
+            fp.write(b"\n]")
+            fp.flush()
+            os.fsync(fp.fileno())
+        self._set_base(_stat(self.json_path), base["count"], base["last"], base["log_size"])
+        return self._base()
+
+    def _tail(self, base):
+        """The records appended to the log since it was seeded or last compacted, as dicts."""
+        with open(self.log_path, "rb") as fp:
+            fp.seek(base["log_size"])
+            lines = fp.read().split(b"\n")
+        return [json.loads(line) for line in lines[:-1]]  # the last piece is empty or a torn line
+
+    def _dicts(self):
+        """Stream records from the log as dicts, skipping a torn last line left by a crash."""
+        self._seed()
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path) as fp:
+            for line in fp:
+                if not line.endswith("\n"):
+                    break
+                yield json.loads(line)
+
+    def __iter__(self):
+        if self.record is None:
+            return self._dicts()
+        return map(self.record.from_dict, self._dicts())
+
+    def __len__(self):
+        """The number of records committed to the JSON array."""
+        return self._seed()["count"]
+
+    def filenames(self):
+        return {r["filename"] for r in self._dicts()}
+
+    def committed(self):
+        """The records in the JSON array, without any the log holds beyond it."""
+        try:
+            with open(self.json_path) as fp:
+                records = json.load(fp)
+        except FileNotFoundError:
+            return []
+        return records if self.record is None else [self.record.from_dict(r) for r in records]
+
+    def start_run(self):
+        """Mark a run in progress; return the records an interrupted run left in the log, if one did."""
+        base = self._seed()
+        if not os.path.exists(self.run_path):
+            if _size(self.log_path) != base["log_size"]:
+                self._seed(force=True)  # appended to but never compacted
+            atomic_write_json(self.run_path, {"pid": os.getpid()}, indent=None)
+            return []
+        tail = self._tail(base)
+        return tail if self.record is None else [self.record.from_dict(r) for r in tail]
+
+    def end_run(self):
+        """Clear the in-progress marker; compact() does this once the log is committed."""
+        try:
+            os.remove(self.run_path)
+        except FileNotFoundError:
+            pass
+
+    def filename_index(self):
+        """Like filenames(), as a FilenameIndex built without holding the records or names."""
+        return FilenameIndex(r["filename"] for r in self._dicts())
+
+    @contextmanager
+    def writer(self):
+        """Yield a function that appends one record to the log immediately; fsync on exit."""
+        self._seed()
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        self._drop_torn_line()
+        with open(self.log_path, "a") as fp:
+            def write(record):
+                fp.write(_dumps(record) + "\n")
+                fp.flush()
+            try:
+                yield write
+            finally:
+                os.fsync(fp.fileno())
+
+    def append(self, records):
+        if not records:
+            return
+        self._seed()
+        self._drop_torn_line()
+        self._write_log(records, "a")
+
+    def _write_log(self, records, mode):
+        with open(self.log_path, mode) as fp:
+            for record in records:
+                fp.write(_dumps(record) + "\n")
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def _drop_torn_line(self):
+        """Truncate a partial trailing line so new records start on a fresh line."""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb+") as fp:
+            fp.seek(0, os.SEEK_END)
+            size = fp.tell()
+            if size == 0:
+                return
+            fp.seek(size - 1)
+            if fp.read(1) == b"\n":
+                return
+            pos = size - 1
+            while pos > 0:
+                step = min(4096, pos)
+                fp.seek(pos - step)
+                chunk = fp.read(step)
+                idx = chunk.rfind(b"\n")
+                if idx >= 0:
+                    pos = pos - step + idx + 1
+                    break
+                pos -= step
+            fp.truncate(pos)
+
+    def compact(self, rewrite=False):
+        """Commit the records appended since the last compaction to the JSON array and return them.
+
+        If a filename was appended more than once, the latest record wins.
+        When there are none the JSON is left alone. When they all sort after
+        the committed ones, as dated statements arriving in order do, they are
+        appended to the array in place; otherwise, or with `rewrite`, the
+        array is rewritten whole from the log, sorted by filename.
+        """
+        base = self._seed()
+        by_filename = {}
+        for record in self._tail(base):
+            by_filename[record["filename"]] = record
+        new = [by_filename[f] for f in sorted(by_filename)]
+        if rewrite or (new and (base["last"] is None or new[0]["filename"] <= base["last"])):
+            self._rewrite()
+        elif new:
+            self._append_json(base, new)
+        self.end_run()
+        return new if self.record is None else [self.record.from_dict(r) for r in new]
+
+    def _rewrite(self):
+        """Write the log out as the JSON array sorted by filename and reseed the log in that order."""
+        by_filename = {}
+        for record in self._dicts():
+            by_filename[record["filename"]] = record
+        records = [by_filename[f] for f in sorted(by_filename)]
+        atomic_write_json(self.json_path, records)
+        self._write_log(records, "w")
+        last = records[-1]["filename"] if records else None
+        self._set_base(_stat(self.json_path), len(records), last, _size(self.log_path))
+
+    def _append_json(self, base, new):
+        """Append records that sort after every committed one to the JSON array in place.
+
+        The bytes written are those json.dump(indent=2) would give for the
+        whole array. The offset of the closing bracket is journaled in the
+        base first, so a crash mid-append is rolled back on the next _seed()
+        and the tail, still in the log, is committed again.
+        """
+        offset = base["json"][0] - 2
+        with open(self.json_path, "rb") as fp:
+            fp.seek(offset)
+            if fp.read() != b"\n]":
+                self._rewrite()
+                return
+        body = json.dumps(new, indent=2)[1:-2]  # "\n  {...},\n  {...}" without the brackets
+        self._set_base(base["json"], base["count"], base["last"], base["log_size"], pending=offset)
+        with open(self.json_path, "rb+") as fp:
+            fp.seek(offset)
+            fp.write(f",{body}\n]".encode())
+            fp.flush()
+            os.fsync(fp.fileno())
+        # The log keeps mirroring the array: its tail is rewritten in sorted order if it wasn't
+        lines = "".join(_dumps(r) + "\n" for r in new).encode()
+        with open(self.log_path, "rb") as fp:
+            fp.seek(base["log_size"])
+            in_order = fp.read() == lines
+        log_size = base["log_size"] + len(lines)
+        count = base["count"] + len(new)
+        last = new[-1]["filename"]
+        self._set_base(_stat(self.json_path), count, last, log_size if in_order else None)
+        if not in_order:
+            with open(self.log_path, "rb+") as fp:
+                fp.truncate(base["log_size"])
+                fp.seek(base["log_size"])
+                fp.write(lines)
+                fp.flush()
+                os.fsync(fp.fileno())
+            self._set_base(_stat(self.json_path), count, last, log_size)
@@ -0,0 +1,127 @@
+"""Typed, compact statement records.
+
+A record used to be a plain dict, rebuilt by every parse_statement and kept
+by the thousand when a record file is loaded. Each utility now has a record
+type with a fixed set of __slots__ (no per-record dict, so a record takes a
+fraction of the memory) whose values are checked when they are set: usage is
+an int, charges are floats, dates are ISO strings, and an unknown field is an
+error rather than a silently misspelt key.
+
+Records still behave like the dicts they replace (`r["kwh"]`, `r.get(...)`,
+`"rules" in r`, `dict(r)`), and the record store writes them out as the same
+JSON objects. The optional fields (statement_date, layout, rules) are left
+out while unset, as they were before.
+"""
+
+import re
+from collections.abc import MutableMapping
+
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+
+OPTIONAL = ("statement_date", "layout", "rules")
+
+
+def _date(value):
+    if not isinstance(value, str) or not ISO_DATE.match(value):
+        raise ValueError(f"not an ISO date: {value!r}")
+    return value
+
+
+def _typed(kind):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, kind):
+            raise ValueError(f"expected {kind.__name__}, got {value!r}")
+        return value
+    return check
+
+
+def _float(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"expected a number, got {value!r}")
+    return float(value)
+
+
+class Record(MutableMapping):
+    """Base for the per-utility record types made by `record_type`."""
+
+    __slots__ = ()
+    FIELDS = {}
+
+    def __init__(self, filename, **values):
+        for name in self.FIELDS:
+            object.__setattr__(self, name, None)
+        self["filename"] = filename
+        for name, value in values.items():
+            self[name] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in OPTIONAL:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        check = self.FIELDS.get(key)
+        if check is None:
+            raise TypeError(f"{type(self).__name__} has no field {key!r}")
+        if value is not None:
+            try:
+                value = check(value)
+            except ValueError as e:
+                raise ValueError(f"{type(self).__name__}.{key}: {e}") from None
+        object.__setattr__(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in OPTIONAL:
+            raise TypeError(f"{type(self).__name__}.{key} can't be removed")
+        self[key]  # KeyError if unset
+        object.__setattr__(self, key, None)
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if name not in OPTIONAL or getattr(self, name) is not None:
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.FIELDS else None
+        return default if value is None and (key in OPTIONAL or key not in self.FIELDS) else value
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.FIELDS, state):
+            object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def record_type(name, usage, costs):
+    """Make the record type for a utility whose `usage` is metered as an int and billed as `costs`."""
+    fields = {"filename": _typed(str), usage: _typed(int)}
+    fields.update((cost, _float) for cost in costs)
+    # In the order process_statement adds them, so the JSON doesn't change
+    fields.update(period_start=_date, period_end=_date, layout=_typed(str), rules=_typed(dict),
+                  statement_date=_date)
+    return type(name, (Record,), {"__slots__": tuple(fields), "FIELDS": fields, "__module__": __name__})
+
+
+ElectricRecord = record_type("ElectricRecord", "kwh", ("supply", "delivery"))
+GasRecord = record_type("GasRecord", "therms", ("supply", "delivery"))
+WaterRecord = record_type("WaterRecord", "cf", ("water", "sewer"))
@@ -0,0 +1,98 @@
+"""Re-parse every statement and diff the result against the committed records.
+
+After a parse_statement rule changes, `extract.py --revalidate` runs the
+current parsers over every statement of the selected providers (in parallel,
+reading text from the cache wherever it is already there, so only the
+parsing is redone) and prints each value that would change in the committed
+data/<provider>.json, field by field:
+
+    == gas_110_tudor: 198 statements re-parsed, 2 records would change
+      therms (1)
+        2012-03-07 National Grid - Statement.pdf    97 -> 79
+      supply (1)
+        2021-11-05 National Grid - Statement.pdf    None -> 43.12
+
+Nothing is written. To apply the changes, delete the affected records from
+data/<provider>.json and run the extraction without --revalidate: the record
+log is reseeded from the edited JSON (see record_store), so those statements
+are parsed again. Records in the log that aren't in the JSON yet (left by an
+interrupted run) count as not extracted. Rule names and layouts are not
+compared, only the values.
+"""
+
+from collections import defaultdict
+
+import ingest
+from pipeline import cache_from_args, fetch_and_process_files, source_statements
+from record_store import RecordStore
+
+IGNORED = ("rules", "layout")
+
+
+def diff_record(stored, parsed):
+    """Return [(field, stored value, parsed value)] for every value that differs."""
+    changes = []
+    for field in dict.fromkeys([*stored.keys(), *parsed.keys()]):
+        if field in IGNORED:
+            continue
+        old, new = stored.get(field), parsed.get(field)
+        if old != new:
+            changes.append((field, old, new))
+    return changes
+
+
+def revalidate(providers, args):
+    """Print the changed values for each provider; return the number of records that would change."""
+    cache = cache_from_args(args)
+    source = ingest.open_source(args.business_dir)
+    plans = []
+    tasks = []
+    for provider in providers:
+        statements = source_statements(source, provider)
+        if statements is None:
+            continue
+        statements.sort()
+        plans.append((provider, len(statements)))
+        tasks.extend((provider, provider.source_dir, f, cache, False, args.lazy, args.words) for f in statements)
+
+    outcomes = fetch_and_process_files(source, tasks, args.jobs, args.prefetch, timeout=args.timeout)
+    if cache is not None:
+        cache.prune()
+
+    total = 0
+    for provider, count in plans:
+        file_tasks, tasks = tasks[:count], tasks[count:]
+        file_outcomes, outcomes = outcomes[:count], outcomes[count:]
+        stored = {r["filename"]: r for r in RecordStore(args.data_dir, provider.output, provider.record).committed()}
+
+        by_field = defaultdict(list)
+        changed = set()
+        unparsed = []
+        new = []
+        for task, (record, warnings, _) in zip(file_tasks, file_outcomes):
+            filename = task[2]
+            if record is None:
+                unparsed.extend(warnings)
+                continue
+            if filename not in stored:
+                new.append(filename)
+                continue
+            for field, old, value in diff_record(stored[filename], record):
+                by_field[field].append((filename, old, value))
+                changed.add(filename)
+        missing = sorted(set(stored) - {task[2] for task in file_tasks})
+
+        print(f"== {provider.name}: {count} statements re-parsed, {len(changed)} records would change")
+        width = max((len(f) for rows in by_field.values() for f, _, _ in rows), default=0)
+        for field, rows in by_field.items():
+            print(f"  {field} ({len(rows)})")
+            for filename, old, value in rows:
+                print(f"    {filename:<{width}}  {old!r} -> {value!r}")
+        if new:
+            print(f"  not in {provider.output} yet: {len(new)}")
+        if missing:
+            print(f"  no statement for {len(missing)} stored record(s): {', '.join(missing)}")
+        for warning in unparsed:
+            print(warning)
+        total += len(changed)
+    return total
@@ -0,0 +1,72 @@
+"""Which parse_statement rules still fire, aggregated over every statement.
+
+`extract.py --rule-stats` re-parses each statement of the selected providers
+with the current parsers, as --revalidate does (in parallel, reading text
+from the cache wherever it is already there), and counts the rule that
+produced each field and the layout each statement was routed to. Stored
+records aren't used: they may predate the rules, and most don't name theirs.
+
+For each provider this prints how many statements each layout took and, per
+field and in the order the rules are tried, how many statements each rule
+produced. It flags rules that never fired and marks rules that fire more
+often than one tried before them (candidates for moving up). Nothing is
+written.
+"""
+
+from collections import Counter
+
+import ingest
+from pipeline import cache_from_args, fetch_and_process_files, source_statements
+
+
+def count_hits(records):
+    """Return a Counter of (field, rule) hits over freshly parsed records."""
+    hits = Counter()
+    for record in records:
+        hits.update(record["rules"].items())
+    return hits
+
+
+def print_rule_stats(providers, args):
+    cache = cache_from_args(args)
+    source = ingest.open_source(args.business_dir)
+    plans = []
+    tasks = []
+    for provider in providers:
+        statements = source_statements(source, provider)
+        if statements is None:
+            continue
+        statements.sort()
+        plans.append((provider, len(statements)))
+        tasks.extend((provider, provider.source_dir, f, cache, False, args.lazy, args.words) for f in statements)
+
+    outcomes = fetch_and_process_files(source, tasks, args.jobs, args.prefetch, timeout=args.timeout)
+    if cache is not None:
+        cache.prune()
+
+    for provider, count in plans:
+        file_outcomes, outcomes = outcomes[:count], outcomes[count:]
+        records = [record for record, _, _ in file_outcomes if record is not None]
+        hits = count_hits(records)
+        print(f"== {provider.name}: {count} statements re-parsed, {count - len(records)} unreadable")
+        if not records:
+            continue
+        layouts = Counter(r.get("layout") or "(unclassified)" for r in records)
+        print("  layouts: " + ", ".join(f"{name} {n}" for name, n in layouts.most_common()))
+        for field, rules in provider.rules.items():
+            print(f"  {field}")
+            best = 0
+            # With --words, word rules are tried before the text rules
+            word_rules = provider.word_rules.get(field, ()) if args.words else ()
+            for rule in [*word_rules, *rules]:
+                n = hits[field, rule.name]
+                note = ""
+                if not n:
+                    note = "  never fired"
+                elif n > best > 0:
+                    note = "  fires more often than an earlier rule"
+                best = max(best, n)
+                print(f"    {rule.name:<34}{n:>6}{note}")
+            missed = sum(1 for r in records if field not in r["rules"])
+            if missed:
+                print(f"    {'(no rule matched)':<34}{missed:>6}")
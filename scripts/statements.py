@@ -0,0 +1,213 @@
+"""Shared PDF text extraction for utility statements.
+
+Each statement is opened (and, if encrypted, authenticated) exactly once. The
+first page is used for the garbled-text check and its text is reused when the
+document turns out to be readable, so no page is parsed twice. In lazy mode
+the remaining pages are only extracted while the caller still needs them.
+In words mode the statement is read as word boxes (see word_index), and its
+text is read from the same open document if the words aren't enough.
+"""
+
+import pymupdf
+
+import credentials
+from profiling import stage
+from text_cache import content_hash
+from word_index import WordIndex
+
+
+def open_statement(filepath, passwords=(), data=None):
+    """Open a PDF, trying each password if it is encrypted. Returns None if none work.
+
+    The password that last worked for the same list is tried first. If `data`
+    is given, the document is opened from those bytes instead of the file.
+    """
+    with stage("open"):
+        doc = pymupdf.open(filepath) if data is None else pymupdf.open(stream=data, filetype="pdf")
+    if doc.is_encrypted:
+        with stage("authenticate"):
+            for pw in credentials.ordered(passwords):
+                if doc.authenticate(pw):
+                    credentials.remember(passwords, pw)
+                    break
+            else:
+                doc.close()
+                return None
+    return doc
+
+
+class _ShiftTable(dict):
+    """str.translate table for the +29 ASCII offset, filled in lazily per code point."""
+
+    def __missing__(self, code):
+        new_code = code + 29
+        if new_code > 126:
+            new_code = new_code - 95
+        self[code] = new_code
+        return new_code
+
+
+DECODE_TABLE = _ShiftTable()
+
+# Same flags as "rawdict", minus image data, which garbled pages never need
+DECODE_FLAGS = pymupdf.TEXTFLAGS_DICT & ~pymupdf.TEXT_PRESERVE_IMAGES
+
+
+def decode_page(page):
+    """Decode a garbled page using the +29 ASCII offset.
+
+    Works line by line on span text from "dict" output, which carries the same
+    characters as "rawdict" without building a dict per character.
+    """
+    lines = []
+    for block in page.get_text("dict", flags=DECODE_FLAGS)["blocks"]:
+        for line in block.get("lines", ()):
+            lines.append("".join([span["text"] for span in line["spans"]]).translate(DECODE_TABLE))
+    return "\n".join(lines)
+
+
+def _first_page(doc, is_garbled):
+    """Return (text, garbled) for the first page."""
+    with stage("garbled_check"):
+        first = doc[0].get_text(sort=True)
+        return first, is_garbled is not None and is_garbled(first)
+
+
+def _page_text(doc, index, first, garbled):
+    if garbled:
+        return decode_page(doc[index])
+    return first if index == 0 else doc[index].get_text(sort=True)
+
+
+def _mode(encrypted, garbled):
+    if garbled:
+        return "decrypted-decoded" if encrypted else "decoded"
+    return "decrypted" if encrypted else "normal"
+
+
+def _doc_text(doc, is_garbled, done=None):
+    """Return (mode, text, complete) for an open document, reading pages until `done(text_so_far)` if given."""
+    encrypted = bool(doc.metadata.get("encryption"))
+    if not doc.page_count:
+        return _mode(encrypted, False), "", True
+    first, garbled = _first_page(doc, is_garbled)
+    if done is None:
+        with stage("extract"):
+            texts = [_page_text(doc, i, first, garbled) for i in range(doc.page_count)]
+        return _mode(encrypted, garbled), ("\n" if garbled else "").join(texts), True
+    separator = "\n" if garbled else ""
+    text = ""
+    read = 0
+    for i in range(doc.page_count):
+        with stage("extract"):
+            page = _page_text(doc, i, first, garbled)
+        text = text + separator + page if i else page
+        read += 1
+        if done(text):
+            break
+    return _mode(encrypted, garbled), text, read == doc.page_count
+
+
+def _extract(filepath, is_garbled, passwords, data=None):
+    """Return (mode, text) for a statement, or (None, None) if it can't be decrypted."""
+    doc = open_statement(filepath, passwords, data)
+    if doc is None:
+        return None, None
+    try:
+        return _doc_text(doc, is_garbled)[:2]
+    finally:
+        doc.close()
+
+
+def _cache_lookup(filepath, cache, data=None):
+    """Read (unless `data` is given) and hash the file; return (data, digest, cached text or None)."""
+    with stage("cache_read"):
+        if data is None:
+            with open(filepath, "rb") as fp:
+                data = fp.read()
+        digest = content_hash(data)
+        hit = cache.get(digest)
+    return data, digest, None if hit is None else hit[1]
+
+
+def extract_text(filepath, is_garbled=None, passwords=(), cache=None, data=None):
+    """Extract statement text, decoding it if `is_garbled(first_page_text)` says so.
+
+    With a TextCache, the file is hashed first and PyMuPDF is skipped entirely
+    on a hit. If `data` is given, it is used instead of reading `filepath`.
+    Returns None if the document is encrypted and none of the passwords work.
+    """
+    if cache is None:
+        return _extract(filepath, is_garbled, passwords, data)[1]
+    data, digest, hit = _cache_lookup(filepath, cache, data)
+    if hit is not None:
+        return hit
+    mode, text = _extract(filepath, is_garbled, passwords, data)
+    if text is not None:
+        with stage("cache_write"):
+            cache.put(digest, mode, text)
+    return text
+
+
+def extract_text_lazily(filepath, done, is_garbled=None, passwords=(), cache=None, data=None):
+    """Like extract_text, but read pages one at a time until `done(text_so_far)` is true.
+
+    Inserts and marketing pages after the ones holding the fields are never
+    extracted. `done` is called after every page, so it should be cheap. A
+    cache hit returns the full cached text without calling `done`; text is
+    only written to the cache when every page was read.
+    """
+    digest = None
+    if cache is not None:
+        data, digest, hit = _cache_lookup(filepath, cache, data)
+        if hit is not None:
+            return hit
+    doc = open_statement(filepath, passwords, data)
+    if doc is None:
+        return None
+    try:
+        mode, text, complete = _doc_text(doc, is_garbled, done)
+    finally:
+        doc.close()
+    if cache is not None and complete:
+        with stage("cache_write"):
+            cache.put(digest, mode, text)
+    return text
+
+
+def extract_words(filepath, is_garbled=None, passwords=(), data=None, needs_text=None, cache=None, done=None):
+    """Return (words, text) for a statement, both read from one open document.
+
+    `words` is a WordIndex of the statement's words, or None if it has no
+    pages or its first page is garbled (a garbled statement's spaces are
+    shifted too, so a whole line comes back as one word). `text` is only read
+    when there are no words or `needs_text(words)` is true, as extract_text
+    would (extract_text_lazily with `done`), and is None otherwise. Returns
+    (None, None) if the document is encrypted and none of the passwords work.
+    Word boxes aren't cached.
+    """
+    doc = open_statement(filepath, passwords, data)
+    if doc is None:
+        return None, None
+    try:
+        index = None
+        if doc.page_count:
+            with stage("words"):
+                pages = [WordIndex.page_words(doc[0])]
+            if is_garbled is None or not is_garbled(" ".join(w[4] for w in pages[0])):
+                with stage("words"):
+                    pages.extend(WordIndex.page_words(doc[i]) for i in range(1, doc.page_count))
+                    index = WordIndex(pages)
+                if needs_text is None or not needs_text(index):
+                    return index, None
+        if cache is not None:
+            data, digest, hit = _cache_lookup(filepath, cache, data)
+            if hit is not None:
+                return index, hit
+        mode, text, complete = _doc_text(doc, is_garbled, done)
+    finally:
+        doc.close()
+    if cache is not None and complete:
+        with stage("cache_write"):
+            cache.put(digest, mode, text)
+    return index, text
@@ -0,0 +1,105 @@
+"""Precomputed chart summaries written next to each data/<provider>.json file.
+
+The dashboard pages used to re-derive labels, per-unit rates, totals, the
+average and the peak from the full record array on every request. The
+pipeline now does that once, whenever a record file is compacted, and writes
+data/<provider>.summary.json with exactly the fields a page charts, plus
+"recordsSha256", the hash of the record file it was built from. The
+dashboard hashes the record file it reads and only trusts a summary whose
+hash matches, so a record file edited by hand (or a summary that wasn't
+rebuilt) doesn't leave stale charts.
+
+Numbers follow the dashboard's old JavaScript: rates and the average are
+rounded half up (Math.round), a missing charge counts as zero in rates and
+totals, and costs are summed in record order so totals match to the cent.
+"""
+
+import hashlib
+import math
+import os
+from datetime import datetime
+
+from record_store import atomic_write_json
+
+
+def js_round(value, places=0):
+    """Round half up like JavaScript's Math.round, not Python's round-half-even."""
+    scale = 10 ** places
+    return math.floor(value * scale + 0.5) / scale if places else math.floor(value + 0.5)
+
+
+def billing_label(date):
+    return datetime.strptime(date, "%Y-%m-%d").strftime("%b %Y")
+
+
+def period_date(record):
+    return record.get("period_end") or record["statement_date"]
+
+
+class Summary:
+    """Which record fields a provider's chart summary is built from.
+
+    `usage` is the metered field (kwh, therms, cf) and `costs` the two charge
+    fields. `unit` and `units` spell the usage in the summary's key names,
+    e.g. supplyPerTherm and totalTherms.
+    """
+
+    def __init__(self, usage, costs, unit, units=None):
+        self.usage = usage
+        self.costs = costs
+        self.unit = unit
+        self.units = units or unit
+
+    def build(self, records):
+        """Return the summary dict for non-empty, sorted records, read in one pass (any iterable will do)."""
+        labels, usage = [], []
+        charges = {cost: [] for cost in self.costs}
+        rates = {cost: [] for cost in self.costs}
+        total_cost = 0
+        for r in records:
+            labels.append(billing_label(period_date(r)))
+            used = r[self.usage]
+            usage.append(used)
+            for cost in self.costs:
+                charges[cost].append(r[cost])
+                rates[cost].append(js_round((r[cost] or 0) / used, 4) if used else 0)
+                total_cost += r[cost] or 0
+
+        summary = {"labels": labels, self.usage + "Data": usage}
+        for cost in self.costs:
+            summary[cost + "Data"] = charges[cost]
+        for cost in self.costs:
+            summary[cost + "Per" + self.unit] = rates[cost]
+        total = sum(u or 0 for u in usage)
+        summary.update({
+            "total" + self.units: total,
+            "totalCost": total_cost,
+            "avg" + self.units: js_round(total / len(usage)),
+            "peak" + self.units: max(u or 0 for u in usage),
+            "periodCount": len(usage),
+            "dateRange": f"{labels[0]} – {labels[-1]}",
+        })
+        return summary
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def summary_path(json_path):
+    return os.path.splitext(json_path)[0] + ".summary.json"
+
+
+def write_summary(provider, json_path, records):
+    """Write the provider's chart summary next to its record file, if it has one."""
+    if provider.summary is None or not records:
+        return None
+    path = summary_path(json_path)
+    summary = provider.summary.build(records)
+    summary["recordsSha256"] = file_sha256(json_path)
+    atomic_write_json(path, summary, indent=None)
+    return path
@@ -0,0 +1,340 @@
+"""Synthetic statement PDFs for every historical layout the parsers handle.
+
+Each layout function takes a random.Random and returns a Statement: the
+lines to draw on each page, whether the PDF is garbled (+29 offset) or
+password-protected, and the record the parser is expected to produce. The
+corpus is generated offline and is deterministic for a given seed.
+
+The vehicle invoices extract_vehicles reads are generated the same way, filed
+under the vehicle's name, with the event expected for each (None for the other
+paperwork kept next to them and for invoices that can't give an event).
+"""
+
+import os
+import random
+from datetime import date, timedelta
+
+import pymupdf
+
+
+class Statement:
+    def __init__(self, provider, layout, filename, pages, expected, garbled=False, password=None):
+        self.provider = provider
+        self.layout = layout
+        self.filename = filename
+        self.pages = pages
+        self.expected = expected
+        self.garbled = garbled
+        self.password = password
+
+
+def garble(text):
+    """Inverse of the +29 decoder: the text a garbled PDF carries for `text`."""
+    out = []
+    for ch in text:
+        code = ord(ch) - 29
+        if code < 32:
+            code += 95
+        out.append(chr(code))
+    return "".join(out)
+
+
+def write_pdf(statement, path):
+    doc = pymupdf.open()
+    for lines in statement.pages:
+        page = doc.new_page()
+        y = 72
+        for line in lines:
+            page.insert_text((72, y), garble(line) if statement.garbled else line, fontsize=10)
+            y += 14
+    options = {}
+    if statement.password:
+        options = dict(encryption=pymupdf.PDF_ENCRYPT_AES_256, user_pw=statement.password, owner_pw="owner")
+    doc.save(path, **options)
+    doc.close()
+
+
+def _period(rnd, first_year, last_year):
+    start = date(rnd.randint(first_year, last_year), rnd.randint(1, 12), rnd.randint(1, 28))
+    end = start + timedelta(days=rnd.randint(27, 34))
+    return start, end, end + timedelta(days=rnd.randint(3, 12))
+
+
+def _long(d):
+    return f"{d:%B} {d.day}, {d.year}"
+
+
+def _record(filename, statement_date, start, end, **values):
+    record = {"filename": filename, **values,
+              "period_start": start.isoformat() if start else None,
+              "period_end": end.isoformat() if end else None}
+    record["statement_date"] = statement_date.isoformat()
+    return record
+
+
+MARKETING_PAGE = ["Save energy and money this season", "Visit us online to enroll in paperless billing"]
+
+
+def nstar_basic_svc_2009(rnd):
+    """Garbled 2009 NStar bill with "Basic Svc Fixed ... KWH" generation line."""
+    start, end, stmt = _period(rnd, 2009, 2009)
+    kwh = rnd.randint(150, 900)
+    supply = round(kwh * 0.0987, 2)
+    delivery = round(rnd.uniform(20, 120), 2)
+    filename = f"{stmt} NStar - Statement.pdf"
+    pages = [[f"Service period {_long(start)} to {_long(end)}",
+              f"Basic Svc Fixed .09870 X {kwh} KWH  {supply:.2f}",
+              f"Delivery Charges Total   ${delivery:.2f}"]]
+    expected = _record(filename, stmt, start, end, kwh=kwh, supply=supply, delivery=delivery)
+    return Statement("electric_110_tudor", "nstar_basic_svc_2009", filename, pages, expected, garbled=True)
+
+
+def eversource_total_use(rnd):
+    """2012-2019 Eversource MA bill with "Total Electricity Use (kWh)" and a marketing insert."""
+    start, end, stmt = _period(rnd, 2012, 2019)
+    kwh = rnd.randint(300, 2400)
+    supply = round(rnd.uniform(30, 300), 2)
+    delivery = round(rnd.uniform(30, 300), 2)
+    filename = f"{stmt} Eversource - Statement.pdf"
+    pages = [[f"{_long(start)} to {_long(end)}",
+              f"Total Electricity Use (kWh) {kwh:,}",
+              f"Subtotal Delivery Services ${delivery:.2f}",
+              f"Subtotal Supplier Services ${supply:.2f}"],
+             MARKETING_PAGE]
+    expected = _record(filename, stmt, start, end, kwh=kwh, supply=supply, delivery=delivery)
+    return Statement("electric_110_tudor", "eversource_total_use", filename, pages, expected)
+
+
+def eversource_service_from(rnd):
+    """2020+ Eversource MA bill with "Service from MM/DD/YY - MM/DD/YY"."""
+    start, end, stmt = _period(rnd, 2020, 2026)
+    days = (end - start).days
+    kwh = rnd.randint(200, 1500)
+    supply = round(rnd.uniform(30, 300), 2)
+    delivery = round(rnd.uniform(30, 300), 2)
+    filename = f"{stmt} Eversource - Statement.pdf"
+    pages = [[f"Service from {start:%m/%d/%y} - {end:%m/%d/%y}  {days} Days",
+              f"{days} Day Billed Use {kwh}",
+              f"Delivery Services ${delivery:.2f}",
+              f"Electric Supply Services ${supply:.2f}"]]
+    expected = _record(filename, stmt, start, end, kwh=kwh, supply=supply, delivery=delivery)
+    return Statement("electric_110_tudor", "eversource_service_from", filename, pages, expected)
+
+
+def eversource_charges_page_2(rnd):
+    """Eversource MA bill with the usage on page 1 and the charge subtotals on page 2."""
+    start, end, stmt = _period(rnd, 2012, 2019)
+    kwh = rnd.randint(300, 2400)
+    supply = round(rnd.uniform(30, 300), 2)
+    delivery = round(rnd.uniform(30, 300), 2)
+    filename = f"{stmt} Eversource - Statement.pdf"
+    pages = [[f"{_long(start)} to {_long(end)}",
+              f"Total Electricity Use (kWh) {kwh:,}"],
+             [f"Subtotal Delivery Services ${delivery:.2f}",
+              f"Subtotal Supplier Services ${supply:.2f}"],
+             MARKETING_PAGE]
+    expected = _record(filename, stmt, start, end, kwh=kwh, supply=supply, delivery=delivery)
+    return Statement("electric_110_tudor", "eversource_charges_page_2", filename, pages, expected)
+
+
+def eversource_nh_energy_chrg(rnd):
+    """Eversource NH bill with "Energy Chrg - Rate R NNN.NNkWh X $X.XXXXX"."""
+    start, end, stmt = _period(rnd, 2022, 2026)
+    days = (end - start).days
+    kwh = rnd.randint(300, 2000)
+    supply = round(rnd.uniform(30, 300), 2)
+    delivery = round(rnd.uniform(30, 300), 2)
+    filename = f"{stmt} Eversource - Statement.pdf"
+    pages = [[f"Service from {start:%m/%d/%y} - {end:%m/%d/%y}  {days} Days",
+              f"Energy Chrg - Rate R  {kwh}.00kWh X $0.12345",
+              f"Subtotal Delivery Services ${delivery:.2f}",
+              f"Subtotal Supplier Services ${supply:.2f}"]]
+    expected = _record(filename, stmt, start, end, kwh=kwh, supply=supply, delivery=delivery)
+    return Statement("electric_69hpl", "eversource_nh_energy_chrg", filename, pages, expected)
+
+
+def ngrid_days_you_used(rnd):
+    """Old National Grid bill: "In NN days you used NNN therms" with meter read dates."""
+    start, end, stmt = _period(rnd, 2009, 2014)
+    therms = rnd.randint(5, 200)
+    supply = round(therms * 0.91234, 2)
+    delivery = round(rnd.uniform(15, 150), 2)
+    filename = f"{stmt} National Grid - Statement.pdf"
+    pages = [[f"{end:%m/%d/%Y} reading  {start:%m/%d/%Y} reading",
+              f"In {(end - start).days} days you used {therms} therms",
+              f"GAS DELIVERY CHARGE ${delivery:.2f}",
+              f"GAS SUPPLY CHARGE @ $.91234 /therm {supply:.2f}"]]
+    expected = _record(filename, stmt, start, end, therms=therms, supply=supply, delivery=delivery)
+    return Statement("gas_110_tudor", "ngrid_days_you_used", filename, pages, expected)
+
+
+def ngrid_total_delivery_services(rnd):
+    """New, password-protected National Grid bill with "Total Delivery Services"."""
+    start, end, stmt = _period(rnd, 2020, 2026)
+    therms = round(rnd.uniform(2, 150), 2)
+    supply = round(rnd.uniform(5, 200), 2)
+    delivery = round(rnd.uniform(15, 200), 2)
+    filename = f"{stmt} National Grid - Statement.pdf"
+    pages = [[f"{start:%b} {start.day}, {start.year} to {end:%b} {end.day}, {end.year}",
+              f"Gas Delivery Charge x {therms} therms",
+              f"Total Delivery Services $ {delivery:.2f}",
+              f"Total Supply Services $ {supply:.2f}"],
+             MARKETING_PAGE]
+    expected = _record(filename, stmt, start, end, therms=round(therms), supply=supply, delivery=delivery)
+    return Statement("gas_110_tudor", "ngrid_total_delivery_services", filename, pages, expected,
+                     password=rnd.choice(["02127", "02127-2641"]))
+
+
+def bwsc_days_header(rnd):
+    """Old BWSC bill (2009-Sep 2019): "MM/DD/YY MM/DD/YY NN DAYS", "cubic feet", "WATER XX.XX"."""
+    start, end, stmt = _period(rnd, 2009, 2019)
+    cf = rnd.randint(100, 1500)
+    water = round(cf * 0.0381, 2)
+    sewer = round(cf * 0.0492, 2)
+    filename = f"{stmt} BWSC - Statement.pdf"
+    # Some scans split amounts like "27. 59"
+    water_text = f"{water:.2f}".replace(".", ". ") if rnd.random() < 0.3 else f"{water:.2f}"
+    pages = [[f"{start:%m/%d/%y} {end:%m/%d/%y} {(end - start).days} DAYS",
+              f"cubic feet {cf}",
+              f"WATER {water_text}",
+              f"SEWER {sewer:.2f}"]]
+    expected = _record(filename, stmt, start, end, cf=cf, water=water, sewer=sewer)
+    return Statement("water_110_tudor", "bwsc_days_header", filename, pages, expected)
+
+
+def bwsc_bill_dates(rnd):
+    """New BWSC bill (Oct 2019+): "Previous/Current Bill Date" and "Current Service Period"."""
+    start, end, stmt = _period(rnd, 2019, 2026)
+    cf = rnd.randint(100, 1500)
+    water = round(cf * 0.0451, 2)
+    sewer = round(cf * 0.0612, 2)
+    filename = f"{stmt} BWSC - Statement.pdf"
+    pages = [[f"Previous Bill Date {start:%m/%d/%Y}",
+              f"Current Bill Date {end:%m/%d/%Y}",
+              f"Current Service Period ({(end - start).days} Days) {cf} CF",
+              f"Water ${water:.2f}",
+              f"Sewer ${sewer:.2f}",
+              f"TOTAL CURRENT CHARGES ... $ {water + sewer:.2f}"]]
+    expected = _record(filename, stmt, start, end, cf=cf, water=water, sewer=sewer)
+    return Statement("water_110_tudor", "bwsc_bill_dates", filename, pages, expected)
+
+
+LAYOUTS = [
+    nstar_basic_svc_2009,
+    eversource_total_use,
+    eversource_service_from,
+    eversource_charges_page_2,
+    eversource_nh_energy_chrg,
+    ngrid_days_you_used,
+    ngrid_total_delivery_services,
+    bwsc_days_header,
+    bwsc_bill_dates,
+]
+
+
+# Shop markers and addresses as in extract_vehicles.SHOPS
+DEALER_SHOPS = [
+    ("Team Nissan", "Team Nissan, Manchester NH"),
+    ("Meineke", "Meineke, Manchester NH"),
+    ("Precision Imports", "Precision Imports, Manchester NH"),
+    ("HM Motor Works", "HM Motor Works, Bedford NH"),
+    ("AutoFair Honda", "AutoFair Honda, Manchester NH"),
+    ("AutoFair Ford", "AutoFair Ford, Manchester NH"),
+    ("Sullivan Tire", "Sullivan Tire, Bedford NH"),
+    ("Auto World", "Auto World, Manchester NH"),
+]
+
+# Work performed, the categories it falls in, and their label
+SERVICES = [
+    ("Oil & filter change, tire rotation", ["oil_change", "tires"], "Oil Change & Tires"),
+    ("Brake pads and rotors replaced", ["brakes"], "Brakes"),
+    ("NH State Safety Inspection", ["inspection"], "Inspection"),
+    ("Cabin air filter replaced", ["filters"], "Filters"),
+    ("Four-wheel alignment", ["alignment"], "Alignment"),
+    ("12V battery replaced", ["battery"], "Battery"),
+]
+
+
+def _event(d, miles, shop, service, cost):
+    service, categories, label = service
+    return {"date": d.isoformat(), "miles": miles, "label": label,
+            "detail": f"{shop} — {service} — ${cost:,.2f}", "is_purchase": False, "provider": shop,
+            "service": service, "cost": cost, "categories": categories}
+
+
+def nissan_repair_order(rnd):
+    """Local shop repair order for the Rogue: slash date, "Mileage In", "Total Due"."""
+    d = date(rnd.randint(2019, 2026), rnd.randint(1, 12), rnd.randint(1, 28))
+    miles = rnd.randint(20000, 130000)
+    marker, shop = rnd.choice(DEALER_SHOPS)
+    service = rnd.choice(SERVICES)
+    cost = round(rnd.uniform(30, 1500), 2)
+    filename = f"{d} {marker} - Invoice.pdf"
+    pages = [[marker, f"Repair Order #{rnd.randint(10000, 99999)}",
+              f"Invoice Date: {d:%m/%d/%Y}",
+              f"Mileage In: {miles:,}",
+              "Description:",
+              service[0],
+              f"Total Due: ${cost:,.2f}"]]
+    return Statement("nissan_rogue", "nissan_repair_order", filename, pages, _event(d, miles, shop, service, cost))
+
+
+def tesla_service_invoice(rnd):
+    """Tesla service center invoice for the Model 3: month-name date, "Odometer", "Amount Due"."""
+    d = date(rnd.randint(2023, 2026), rnd.randint(1, 12), rnd.randint(1, 28))
+    miles = rnd.randint(500, 60000)
+    service = rnd.choice(SERVICES)
+    cost = round(rnd.uniform(30, 900), 2)
+    filename = f"{d} Tesla Service Invoice.pdf"
+    pages = [["Tesla Service Center",
+              f"Date: {_long(d)}",
+              f"Odometer: {miles}",
+              "Work Performed:",
+              service[0],
+              f"Amount Due: ${cost:,.2f}"]]
+    return Statement("tesla_model3", "tesla_service_invoice", filename, pages,
+                     _event(d, miles, "Tesla, Londonderry NH", service, cost))
+
+
+def counter_receipt_no_odometer(rnd):
+    """Shop counter receipt with no odometer reading; the dashboard needs miles, so it gives no event."""
+    d = date(rnd.randint(2019, 2026), rnd.randint(1, 12), rnd.randint(1, 28))
+    marker, _ = rnd.choice(DEALER_SHOPS)
+    filename = f"{d} {marker} - Receipt.pdf"
+    pages = [[marker, f"Invoice Date: {d:%m/%d/%Y}", "Wiper blades", f"Total Due: ${rnd.uniform(10, 80):,.2f}"]]
+    return Statement("nissan_rogue", "counter_receipt_no_odometer", filename, pages, None)
+
+
+def insurance_declaration(rnd):
+    """Insurance declaration page filed with the Rogue's invoices; not an invoice."""
+    d = date(rnd.randint(2019, 2026), rnd.randint(1, 12), rnd.randint(1, 28))
+    filename = f"{d} Safety Insurance - Declaration.pdf"
+    pages = [["Safety Insurance", f"Policy Date: {d:%m/%d/%Y}", f"Amount Due: ${rnd.uniform(400, 1600):,.2f}"]]
+    return Statement("nissan_rogue", "insurance_declaration", filename, pages, None)
+
+
+INVOICE_LAYOUTS = [
+    nissan_repair_order,
+    tesla_service_invoice,
+    counter_receipt_no_odometer,
+    insurance_declaration,
+]
+
+
+def generate(directory, per_layout=5, seed=0, layouts=LAYOUTS):
+    """Write the corpus under directory/<provider>/ and return the Statements written."""
+    rnd = random.Random(seed)
+    statements = []
+    for layout in layouts:
+        made = 0
+        while made < per_layout:
+            statement = layout(rnd)
+            folder = os.path.join(directory, statement.provider)
+            path = os.path.join(folder, statement.filename)
+            if os.path.exists(path):
+                continue
+            os.makedirs(folder, exist_ok=True)
+            write_pdf(statement, path)
+            statements.append(statement)
+            made += 1
+    return statements
@@ -0,0 +1,80 @@
+"""On-disk cache of extracted statement text.
+
+Entries are keyed by the SHA-256 of the PDF bytes plus the extraction mode
+that produced the text ("normal", "decoded", "decrypted", ...), so renamed or
+re-downloaded statements hit the cache and a change to a parse_statement regex
+only re-runs the parser, not PyMuPDF. The cache is capped in size and evicts
+the least recently used entries first (access time is tracked via mtime).
+"""
+
+import hashlib
+import os
+import tempfile
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "statement_text")
+CACHE_VERSION = "v1"
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class TextCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = os.path.join(directory, CACHE_VERSION)
+        self.max_bytes = max_bytes
+
+    def _shard(self, digest):
+        return os.path.join(self.directory, digest[:2])
+
+    def get(self, digest):
+        """Return (mode, text) for a cached digest, or None."""
+        shard = self._shard(digest)
+        try:
+            names = os.listdir(shard)
+        except FileNotFoundError:
+            return None
+        prefix = digest + "."
+        for name in names:
+            if name.startswith(prefix) and name.endswith(".txt"):
+                path = os.path.join(shard, name)
+                try:
+                    with open(path, encoding="utf-8") as fp:
+                        text = fp.read()
+                    os.utime(path)
+                except FileNotFoundError:
+                    return None
+                return name[len(prefix):-len(".txt")], text
+        return None
+
+    def put(self, digest, mode, text):
+        shard = self._shard(digest)
+        os.makedirs(shard, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=shard, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            fp.write(text)
+        os.replace(tmp, os.path.join(shard, f"{digest}.{mode}.txt"))
+
+    def prune(self):
+        """Evict least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,151 @@
+"""Watch provider folders and extract statements as soon as they land.
+
+Uses filesystem notifications from `watchdog` when it is installed and falls
+back to polling otherwise. The polling fallback only lists a folder when its
+mtime changes, so an idle watch never rescans the archive. A new file is
+parsed once its size and mtime have been stable for `settle` seconds, so a
+download still being written is never read half-finished.
+"""
+
+import os
+import queue
+import time
+
+from pipeline import cache_from_args, is_statement, list_statements, process_files, run, save_outcomes
+from record_store import RecordStore
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # polling fallback
+    Observer = None
+
+
+class _Watched:
+    """One provider folder and the filenames already handled for it."""
+
+    def __init__(self, provider, base, store):
+        self.provider = provider
+        self.base = base
+        self.store = store
+        # Everything already in the folder was tried by the catch-up run
+        self.known = store.filenames()
+        if os.path.isdir(base):
+            self.known.update(list_statements(base))
+        self.dir_mtime = None
+
+
+if Observer is not None:
+    class _QueueHandler(FileSystemEventHandler):
+        def __init__(self, events):
+            self.events = events
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self.events.put(event.src_path)
+
+        def on_modified(self, event):
+            if not event.is_directory:
+                self.events.put(event.src_path)
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                self.events.put(event.dest_path)
+
+
+def _poll_new_files(watched):
+    """Yield paths of unknown statements in folders whose mtime has changed."""
+    for w in watched.values():
+        try:
+            mtime = os.stat(w.base).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if mtime == w.dir_mtime:
+            continue
+        w.dir_mtime = mtime
+        for entry in os.scandir(w.base):
+            if entry.is_file() and is_statement(entry.name) and entry.name not in w.known:
+                yield entry.path
+
+
+def watch(providers, args, interval=1.0, settle=2.0):
+    """Run a catch-up extraction, then extract new statements as they arrive. Stops on Ctrl-C."""
+    run(providers, args)
+
+    cache = cache_from_args(args)
+    watched = {}
+    for provider in providers:
+        base = os.path.abspath(provider.base(args.business_dir))
+        watched[base] = _Watched(provider, base, RecordStore(args.data_dir, provider.output, provider.record))
+
+    events = queue.Queue()
+    observer = None
+    if Observer is not None:
+        observer = Observer()
+        handler = _QueueHandler(events)
+        for base in watched:
+            if os.path.isdir(base):
+                observer.schedule(handler, base, recursive=False)
+        observer.start()
+        print(f"Watching {len(watched)} folder(s) for new statements (Ctrl-C to stop)...")
+    else:
+        for w in watched.values():
+            w.dir_mtime = os.stat(w.base).st_mtime_ns if os.path.isdir(w.base) else None
+        print(f"Polling {len(watched)} folder(s) every {interval:g}s for new statements (Ctrl-C to stop)...")
+
+    pending = {}  # path -> (size, mtime, stable since)
+    try:
+        while True:
+            if observer is not None:
+                try:
+                    paths = [events.get(timeout=interval)]
+                    while not events.empty():
+                        paths.append(events.get_nowait())
+                except queue.Empty:
+                    paths = []
+            else:
+                time.sleep(interval)
+                paths = list(_poll_new_files(watched))
+
+            now = time.monotonic()
+            for path in paths:
+                w = watched.get(os.path.dirname(os.path.abspath(path)))
+                name = os.path.basename(path)
+                if w is not None and is_statement(name) and name not in w.known:
+                    pending.setdefault(path, (None, None, now))
+
+            ready = []
+            for path, (size, mtime, since) in list(pending.items()):
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    del pending[path]
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                    pending[path] = (st.st_size, st.st_mtime_ns, now)
+                elif st.st_size > 0 and now - since >= settle:
+                    del pending[path]
+                    ready.append(path)
+            if ready:
+                _extract_ready(sorted(ready), watched, cache, args.jobs, args.lazy, args.words, args.timeout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def _extract_ready(paths, watched, cache, jobs, lazy=False, words=False, timeout=None):
+    by_folder = {}
+    for path in paths:
+        by_folder.setdefault(os.path.dirname(os.path.abspath(path)), []).append(os.path.basename(path))
+    for base, names in by_folder.items():
+        w = watched[base]
+        outcomes = process_files([(w.provider, base, name, cache, False, lazy, words) for name in names], jobs,
+                                 timeout)
+        print(f"== {w.provider.title}: {', '.join(names)}")
+        save_outcomes(w.provider, w.store, outcomes)
+        w.known.update(names)
+    if cache is not None:
+        cache.prune()
@@ -0,0 +1,160 @@
+"""Label/value lookup on PyMuPDF word boxes.
+
+The text rules in fields.py search a statement flattened to one string,
+which is why they need `.*?` gaps between a label and a far-away amount,
+"reversed" variants and amounts split like "27. 59". A WordIndex keeps the
+words of every page with their positions instead: words are grouped into
+rows by their vertical centre, each row is sorted left to right, and each
+word is indexed by its text. Finding a label is a dict lookup on its first
+word plus a check of the words after it, and the value is read from the
+words nearest the label, to its right on the same row or on the closest
+row below that overlaps it horizontally (found by bisection).
+
+WordRules work like fields.Rule (same converters, same `apply` interface,
+so `fill` and `first_match` take them as they are), but their pattern is
+only matched against the few words next to the label.
+"""
+
+import re
+from bisect import bisect_right
+
+WORDS = 8
+BELOW_ROWS = 3
+
+# An amount right of its label, possibly split like "$ 27. 59"
+AMOUNT = r'\$?\s*(\d[\d,]*\s*\.\s*\d{2})'
+
+
+class _Row:
+    __slots__ = ("top", "bottom", "words", "x0s")
+
+    def __init__(self, words):
+        words.sort(key=lambda w: w[0])
+        self.words = words
+        self.x0s = [w[0] for w in words]
+        self.top = min(w[1] for w in words)
+        self.bottom = max(w[3] for w in words)
+
+
+class _Page:
+    def __init__(self, words):
+        rows = []
+        current = []
+        centre = None
+        for w in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+            mid = (w[1] + w[3]) / 2
+            if current and mid - centre > (w[3] - w[1]) / 2:
+                rows.append(_Row(current))
+                current = []
+            if not current:
+                centre = mid
+            current.append(w)
+        if current:
+            rows.append(_Row(current))
+        self.rows = rows
+        self.tops = [row.top for row in rows]
+
+
+class WordIndex:
+    """The words of a statement, by page and row, indexed by their text."""
+
+    def __init__(self, pages):
+        """`pages` holds one list of (x0, y0, x1, y1, text) per page."""
+        self.pages = [_Page(words) for words in pages]
+        self._by_text = {}
+        for p, page in enumerate(self.pages):
+            for r, row in enumerate(page.rows):
+                for i, word in enumerate(row.words):
+                    self._by_text.setdefault(word[4], []).append((p, r, i))
+
+    @staticmethod
+    def page_words(page):
+        """A PyMuPDF page's words as the (x0, y0, x1, y1, text) tuples __init__ takes."""
+        return [w[:5] for w in page.get_text("words")]
+
+    def text(self):
+        """The words row by row, one line per row, for layout markers and the text rules."""
+        return "\n".join(" ".join(w[4] for w in row.words) for page in self.pages for row in page.rows)
+
+    def find(self, label):
+        """Yield (page, row, first word, last word) for each place the words of `label` occur in a row."""
+        first, *rest = label.split()
+        for p, r, i in self._by_text.get(first, ()):
+            words = self.pages[p].rows[r].words
+            end = i + len(rest)
+            if end < len(words) and all(words[i + 1 + k][4] == t for k, t in enumerate(rest)):
+                yield p, r, i, end
+
+    def right(self, label, count=WORDS):
+        """Yield the text of up to `count` words right of each occurrence of `label`."""
+        for p, r, _, end in self.find(label):
+            words = self.pages[p].rows[r].words
+            yield " ".join(w[4] for w in words[end + 1:end + 1 + count])
+
+    def below(self, label, count=WORDS):
+        """Yield up to `count` words under each occurrence of `label`.
+
+        They come from the nearest of the next BELOW_ROWS rows with a word
+        overlapping the label horizontally, starting at the leftmost such word.
+        """
+        for p, r, i, end in self.find(label):
+            page = self.pages[p]
+            label_row = page.rows[r]
+            left, right = label_row.words[i][0], label_row.words[end][2]
+            start = bisect_right(page.tops, label_row.bottom)
+            for row in page.rows[start:start + BELOW_ROWS]:
+                j = bisect_right(row.x0s, right)
+                k = j
+                while k > 0 and row.words[k - 1][2] >= left:
+                    k -= 1
+                if k < j:
+                    yield " ".join(w[4] for w in row.words[k:k + count])
+                    break
+
+    def line(self, label):
+        """Yield the whole row of each occurrence of `label`."""
+        for p, r, _, _ in self.find(label):
+            yield " ".join(w[4] for w in self.pages[p].rows[r].words)
+
+
+class WordRule:
+    """A value read next to a label.
+
+    `pattern` is matched at the start of the words `direction` of the label
+    ("right" or "below"), or searched in its whole "line", and the match goes
+    to `convert` as with fields.Rule. With `findall`, the matches from every
+    occurrence of the label are collected and converted together.
+    """
+
+    def __init__(self, name, label, pattern, convert, direction="right", flags=0, findall=False, words=WORDS):
+        self.name = name
+        self.label = label
+        self.regex = re.compile(pattern, flags)
+        self.convert = convert
+        self.direction = direction
+        self.findall = findall
+        self.words = words
+
+    def _candidates(self, index):
+        if self.direction == "right":
+            return index.right(self.label, self.words)
+        if self.direction == "below":
+            return index.below(self.label, self.words)
+        return index.line(self.label)
+
+    def apply(self, index):
+        """Return the converted value read next to the label, or None."""
+        if self.findall:
+            found = [m for text in self._candidates(index) for m in self.regex.findall(text)]
+            args = [found] if found else []
+        else:
+            match = self.regex.match if self.direction != "line" else self.regex.search
+            args = (m for m in map(match, self._candidates(index)) if m is not None)
+        for arg in args:
+            try:
+                value = self.convert(arg)
+            except ValueError:
+                continue
+            if value is not None:
+                return value
+        return None
@@ -2,12 +2,9 @@ import type { Metadata } from 'next';
 import Link from 'next/link';
 import PropertyLabel from '@/components/PropertyLabel';
 import {
-  loadElectricRecords,
-  processElectricData,
-  loadGasRecords,
-  processGasData,
-  loadWaterRecords,
-  processWaterData,
+  loadElectricChartData,
+  loadGasChartData,
+  loadWaterChartData,
   loadVehicleData,
   processVehicleData,
   formatCurrency,
@@ -58,10 +55,10 @@ function DashboardCard({ href, icon, label, title, detail, stats }: DashboardCar
 
 export default function DashboardPage() {
   // Load all data server-side
-  const electric110 = processElectricData(loadElectricRecords('electric_110_tudor.json'));
-  const electric69 = processElectricData(loadElectricRecords('electric_69hpl.json'));
-  const gas110 = processGasData(loadGasRecords('gas_110_tudor.json'));
-  const water110 = processWaterData(loadWaterRecords('water_110_tudor.json'));
+  const electric110 = loadElectricChartData('electric_110_tudor.json');
+  const electric69 = loadElectricChartData('electric_69hpl.json');
+  const gas110 = loadGasChartData('gas_110_tudor.json');
+  const water110 = loadWaterChartData('water_110_tudor.json');
   const nissanData = loadVehicleData('vehicle_nissan_rogue.json');
   const teslaData = loadVehicleData('vehicle_tesla_model3.json');
   const nissan = processVehicleData(nissanData);
@@ -2,7 +2,7 @@ import type { Metadata } from 'next';
 import BackButton from '@/components/BackButton';
 import StatCard from '@/components/StatCard';
 import BarChart from '@/components/BarChart';
-import { loadGasRecords, processGasData, formatCurrency } from '@/lib/data';
+import { loadGasChartData, formatCurrency } from '@/lib/data';
 
 export const metadata: Metadata = { title: '110 Tudor St — Natural Gas' };
 
@@ -12,8 +12,7 @@ const COLOR_DELIVERY = 'rgba(255, 183, 77, 0.7)';
 const COLOR_STAT = '#E65100';
 
 export default function Page() {
-  const records = loadGasRecords('gas_110_tudor.json');
-  const d = processGasData(records);
+  const d = loadGasChartData('gas_110_tudor.json');
 
   return (
     <main className="max-w-[1400px] mx-auto px-5 py-5 min-h-screen">
@@ -2,7 +2,7 @@ import type { Metadata } from 'next';
 import BackButton from '@/components/BackButton';
 import StatCard from '@/components/StatCard';
 import BarChart from '@/components/BarChart';
-import { loadWaterRecords, processWaterData, formatCurrency } from '@/lib/data';
+import { loadWaterChartData, formatCurrency } from '@/lib/data';
 
 export const metadata: Metadata = { title: '110 Tudor St — Water & Sewer' };
 
@@ -12,8 +12,7 @@ const COLOR_SEWER = 'rgba(100, 181, 246, 0.7)';
 const COLOR_STAT = '#1565C0';
 
 export default function Page() {
-  const records = loadWaterRecords('water_110_tudor.json');
-  const d = processWaterData(records);
+  const d = loadWaterChartData('water_110_tudor.json');
 
   return (
     <main className="max-w-[1400px] mx-auto px-5 py-5 min-h-screen">
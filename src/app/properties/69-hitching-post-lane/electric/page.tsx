@@ -2,7 +2,7 @@ import type { Metadata } from 'next';
 import BackButton from '@/components/BackButton';
 import StatCard from '@/components/StatCard';
 import BarChart from '@/components/BarChart';
-import { loadElectricRecords, processElectricData, formatCurrency } from '@/lib/data';
+import { loadElectricChartData, formatCurrency } from '@/lib/data';
 
 export const metadata: Metadata = { title: '69 Hitching Post Ln — Electricity' };
 
@@ -12,8 +12,7 @@ const COLOR_DELIVERY = 'rgba(255, 152, 0, 0.7)';
 const COLOR_STAT = '#2196F3';
 
 export default function Page() {
-  const records = loadElectricRecords('electric_69hpl.json');
-  const d = processElectricData(records);
+  const d = loadElectricChartData('electric_69hpl.json');
 
   return (
     <main className="max-w-[1400px] mx-auto px-5 py-5 min-h-screen">
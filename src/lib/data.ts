@@ -1,11 +1,7 @@
+import { createHash } from 'crypto';
 import { readFileSync } from 'fs';
 import { join } from 'path';
-import type {
-  ElectricRecord,
-  GasRecord,
-  WaterRecord,
-  VehicleData,
-} from './types';
+import type { VehicleData } from './types';
 
 function dataPath(filename: string): string {
   return join(process.cwd(), 'data', filename);
@@ -15,6 +11,83 @@ function readJson<T>(filename: string): T {
   return JSON.parse(readFileSync(dataPath(filename), 'utf-8')) as T;
 }
 
+// Which record fields a chart is built from, as in the providers' Summary
+// specs: the usage field, the two charge fields and the unit in key names.
+type SummarySpec = {
+  usage: string;
+  costs: [string, string];
+  unit: string;
+  units?: string;
+};
+
+type BillRecord = {
+  period_end?: string | null;
+  statement_date: string;
+  [field: string]: string | number | null | undefined;
+};
+
+// The same series and stats scripts/summaries.py writes, computed from the
+// records: a missing charge counts as zero and costs are summed in order.
+function buildSummary(records: BillRecord[], spec: SummarySpec): Record<string, unknown> {
+  const value = (r: BillRecord, field: string) => (r[field] as number | null | undefined) ?? null;
+  const dates = records.map((r) => r.period_end ?? r.statement_date);
+  const usage = records.map((r) => value(r, spec.usage));
+  const units = spec.units ?? spec.unit;
+  const summary: Record<string, unknown> = {
+    labels: dates.map(formatBillingLabel),
+    [spec.usage + 'Data']: usage,
+  };
+  for (const cost of spec.costs) {
+    summary[cost + 'Data'] = records.map((r) => value(r, cost));
+  }
+  for (const cost of spec.costs) {
+    summary[cost + 'Per' + spec.unit] = records.map((r) => {
+      const used = value(r, spec.usage);
+      return used ? Math.round(((value(r, cost) ?? 0) / used) * 1e4) / 1e4 : 0;
+    });
+  }
+  const total = usage.reduce<number>((a, u) => a + (u ?? 0), 0);
+  let totalCost = 0;
+  for (const r of records) {
+    for (const cost of spec.costs) totalCost += value(r, cost) ?? 0;
+  }
+  return {
+    ...summary,
+    ['total' + units]: total,
+    totalCost,
+    ['avg' + units]: Math.round(total / records.length),
+    ['peak' + units]: Math.max(...usage.map((u) => u ?? 0)),
+    periodCount: records.length,
+    dateRange: formatDateRange(dates[0], dates[dates.length - 1]),
+  };
+}
+
+// Chart series and stats are precomputed by the extraction pipeline
+// (scripts/summaries.py) into data/<name>.summary.json next to each record file,
+// stamped with the sha256 of the record file they were built from. A summary
+// that is missing or doesn't match the record file on disk (edited by hand,
+// or not rebuilt since) is ignored and the charts are computed from the
+// records instead, with a warning to run `extract.py --compact`.
+function readSummary<T>(filename: string, spec: SummarySpec): T {
+  const recordFile = readFileSync(dataPath(filename));
+  const recordsSha256 = createHash('sha256').update(recordFile).digest('hex');
+  const summaryName = filename.replace(/\.json$/, '.summary.json');
+  let summary: (T & { recordsSha256?: string }) | null = null;
+  try {
+    summary = readJson<T & { recordsSha256?: string }>(summaryName);
+  } catch (err) {
+    if ((err as NodeJS.ErrnoException).code !== 'ENOENT') throw err;
+  }
+  if (summary?.recordsSha256 === recordsSha256) {
+    return summary;
+  }
+  console.warn(
+    `data/${summaryName} is ${summary ? 'stale' : 'missing'} for data/${filename}; ` +
+      'charting from the records (run scripts/extract.py --compact to rebuild it)'
+  );
+  return buildSummary(JSON.parse(recordFile.toString('utf-8')) as BillRecord[], spec) as T;
+}
+
 export function formatBillingLabel(dateStr: string): string {
   const date = new Date(dateStr + 'T12:00:00');
   return date.toLocaleDateString('en-US', { month: 'short', year: 'numeric' });
@@ -43,10 +116,6 @@ export function formatCurrency(amount: number, decimals = 0): string {
 
 // ── Electric ────────────────────────────────────────────────────────────────
 
-export function loadElectricRecords(filename: string): ElectricRecord[] {
-  return readJson<ElectricRecord[]>(filename);
-}
-
 export type ElectricChartData = {
   labels: string[];
   kwhData: number[];
@@ -62,48 +131,16 @@ export type ElectricChartData = {
   dateRange: string;
 };
 
-export function processElectricData(records: ElectricRecord[]): ElectricChartData {
-  const labels = records.map((r) => formatBillingLabel(r.period_end ?? r.statement_date));
-  const kwhData = records.map((r) => r.kwh);
-  const supplyData = records.map((r) => r.supply);
-  const deliveryData = records.map((r) => r.delivery);
-  const supplyPerKwh = records.map((r) =>
-    r.kwh > 0 ? Math.round((r.supply / r.kwh) * 1e4) / 1e4 : 0
-  );
-  const deliveryPerKwh = records.map((r) =>
-    r.kwh > 0 ? Math.round((r.delivery / r.kwh) * 1e4) / 1e4 : 0
-  );
-  const totalKwh = kwhData.reduce((a, b) => a + b, 0);
-  const totalCost = records.reduce((a, r) => a + r.supply + r.delivery, 0);
-  const avgKwh = Math.round(totalKwh / records.length);
-  const peakKwh = Math.max(...kwhData);
-  const dateRange = formatDateRange(
-    records[0].period_end ?? records[0].statement_date,
-    records[records.length - 1].period_end ?? records[records.length - 1].statement_date
-  );
-
-  return {
-    labels,
-    kwhData,
-    supplyData,
-    deliveryData,
-    supplyPerKwh,
-    deliveryPerKwh,
-    totalKwh,
-    totalCost,
-    avgKwh,
-    peakKwh,
-    periodCount: records.length,
-    dateRange,
-  };
+export function loadElectricChartData(filename: string): ElectricChartData {
+  return readSummary<ElectricChartData>(filename, {
+    usage: 'kwh',
+    costs: ['supply', 'delivery'],
+    unit: 'Kwh',
+  });
 }
 
 // ── Gas ─────────────────────────────────────────────────────────────────────
 
-export function loadGasRecords(filename: string): GasRecord[] {
-  return readJson<GasRecord[]>(filename);
-}
-
 export type GasChartData = {
   labels: string[];
   thermsData: number[];
@@ -119,48 +156,17 @@ export type GasChartData = {
   dateRange: string;
 };
 
-export function processGasData(records: GasRecord[]): GasChartData {
-  const labels = records.map((r) => formatBillingLabel(r.period_end ?? r.statement_date));
-  const thermsData = records.map((r) => r.therms);
-  const supplyData = records.map((r) => r.supply);
-  const deliveryData = records.map((r) => r.delivery);
-  const supplyPerTherm = records.map((r) =>
-    r.therms > 0 ? Math.round((r.supply / r.therms) * 1e4) / 1e4 : 0
-  );
-  const deliveryPerTherm = records.map((r) =>
-    r.therms > 0 ? Math.round((r.delivery / r.therms) * 1e4) / 1e4 : 0
-  );
-  const totalTherms = thermsData.reduce((a, b) => a + b, 0);
-  const totalCost = records.reduce((a, r) => a + r.supply + r.delivery, 0);
-  const avgTherms = Math.round(totalTherms / records.length);
-  const peakTherms = Math.max(...thermsData);
-  const dateRange = formatDateRange(
-    records[0].period_end ?? records[0].statement_date,
-    records[records.length - 1].period_end ?? records[records.length - 1].statement_date
-  );
-
-  return {
-    labels,
-    thermsData,
-    supplyData,
-    deliveryData,
-    supplyPerTherm,
-    deliveryPerTherm,
-    totalTherms,
-    totalCost,
-    avgTherms,
-    peakTherms,
-    periodCount: records.length,
-    dateRange,
-  };
+export function loadGasChartData(filename: string): GasChartData {
+  return readSummary<GasChartData>(filename, {
+    usage: 'therms',
+    costs: ['supply', 'delivery'],
+    unit: 'Therm',
+    units: 'Therms',
+  });
 }
 
 // ── Water ───────────────────────────────────────────────────────────────────
 
-export function loadWaterRecords(filename: string): WaterRecord[] {
-  return readJson<WaterRecord[]>(filename);
-}
-
 export type WaterChartData = {
   labels: string[];
   cfData: number[];
@@ -176,40 +182,12 @@ export type WaterChartData = {
   dateRange: string;
 };
 
-export function processWaterData(records: WaterRecord[]): WaterChartData {
-  const labels = records.map((r) => formatBillingLabel(r.period_end ?? r.statement_date));
-  const cfData = records.map((r) => r.cf);
-  const waterData = records.map((r) => r.water);
-  const sewerData = records.map((r) => r.sewer);
-  const waterPerCf = records.map((r) =>
-    r.cf > 0 ? Math.round((r.water / r.cf) * 1e4) / 1e4 : 0
-  );
-  const sewerPerCf = records.map((r) =>
-    r.cf > 0 ? Math.round((r.sewer / r.cf) * 1e4) / 1e4 : 0
-  );
-  const totalCf = cfData.reduce((a, b) => a + b, 0);
-  const totalCost = records.reduce((a, r) => a + r.water + r.sewer, 0);
-  const avgCf = Math.round(totalCf / records.length);
-  const peakCf = Math.max(...cfData);
-  const dateRange = formatDateRange(
-    records[0].period_end ?? records[0].statement_date,
-    records[records.length - 1].period_end ?? records[records.length - 1].statement_date
-  );
-
-  return {
-    labels,
-    cfData,
-    waterData,
-    sewerData,
-    waterPerCf,
-    sewerPerCf,
-    totalCf,
-    totalCost,
-    avgCf,
-    peakCf,
-    periodCount: records.length,
-    dateRange,
-  };
+export function loadWaterChartData(filename: string): WaterChartData {
+  return readSummary<WaterChartData>(filename, {
+    usage: 'cf',
+    costs: ['water', 'sewer'],
+    unit: 'Cf',
+  });
 }
 
 // ── Vehicle ──────────────────────────────────────────────────────────────────
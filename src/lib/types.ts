@@ -1,33 +1,3 @@
-export type ElectricRecord = {
-  filename: string;
-  kwh: number;
-  supply: number;
-  delivery: number;
-  period_start: string | null;
-  period_end: string | null;
-  statement_date: string;
-};
-
-export type GasRecord = {
-  filename: string;
-  therms: number;
-  supply: number;
-  delivery: number;
-  period_start: string | null;
-  period_end: string | null;
-  statement_date: string;
-};
-
-export type WaterRecord = {
-  filename: string;
-  cf: number;
-  water: number;
-  sewer: number;
-  period_start: string | null;
-  period_end: string | null;
-  statement_date: string;
-};
-
 export type VehicleEvent = {
   date: string;
   miles: number;